@@ -0,0 +1,92 @@
+"""Compare /find-friends filtering through the users indexes with the old loop.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_find_friends [SIZE ...]
+
+Sizes default to 100k users. Each filter combination is run once per
+approach; the old loop is the one find_friends used to run over every user,
+followed by slicing out the first page.
+"""
+import random
+import sys
+import time
+
+from tinydb.storages import MemoryStorage
+
+from db import helpers, users
+from db.storage import BatchingMiddleware
+
+DEFAULT_SIZES = [100_000]
+
+FILTERS = [
+    {},
+    {'is_clown': True},
+    {'has_clown_horns': True},
+    {'is_clown': True, 'has_clown_horns': True},
+    {'min_shoe_size': 40},
+    {'is_clown': True, 'min_shoe_size': 25},
+    {'is_clown': True, 'has_clown_horns': True, 'min_shoe_size': 45},
+]
+
+
+def make_db(size):
+    rng = random.Random(0)
+    db = helpers.SharedTinyDB(storage=BatchingMiddleware(MemoryStorage))
+    db.table('users').insert_multiple({
+        'username': 'user{}'.format(i),
+        'friends': [],
+        'profile': {
+            'shoe_size': rng.randrange(5, 50),
+            'is_clown': rng.random() < 0.3,
+            'has_clown_horns': rng.random() < 0.1,
+        },
+    } for i in range(size))
+    return db
+
+
+def loop(db, exclude, is_clown=False, has_clown_horns=False, min_shoe_size=0):
+    found = []
+    for user in db.table('users').all():
+        profile = user['profile']
+        if user['username'] == exclude:
+            continue
+        if is_clown and not profile.get('is_clown', False):
+            continue
+        if has_clown_horns and not profile.get('has_clown_horns', False):
+            continue
+        shoe_size = profile.get('shoe_size')
+        if min_shoe_size > 0 and (shoe_size is None or shoe_size < min_shoe_size):
+            continue
+        found.append(user)
+    return found[:users.PAGE_SIZE]
+
+
+def timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    func(*args, **kwargs)
+    return time.perf_counter() - start
+
+
+def describe(filters):
+    return ', '.join('{}={}'.format(k, v) for k, v in filters.items()) or '(none)'
+
+
+def main(sizes):
+    for size in sizes:
+        db = make_db(size)
+        # build the indexes outside the timed section
+        users.find_users(db, is_clown=True, has_clown_horns=True, min_shoe_size=1)
+
+        print('{} users'.format(size))
+        print('{:>55} {:>12} {:>12} {:>10}'.format('filters', 'loop (ms)', 'index (ms)', 'speedup'))
+        for filters in FILTERS:
+            scan = timed(loop, db, 'user0', **filters)
+            indexed = timed(users.find_users, db, exclude='user0', **filters)
+            print('{:>55} {:>12.2f} {:>12.2f} {:>9.0f}x'.format(
+                describe(filters), scan * 1e3, indexed * 1e3, scan / indexed))
+        db.close()
+
+
+if __name__ == '__main__':
+    main([int(arg) for arg in sys.argv[1:]] or DEFAULT_SIZES)
@@ -0,0 +1,91 @@
+"""Measure login throughput and latency with passwords hashed inline and in
+the password pool.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_login [THREADS ...]
+
+Each run starts THREADS request threads (default 4 and 16) that log in
+through POST /login over and over for a few seconds. Meanwhile one more
+thread keeps loading the login page, to show how the rest of the site fares
+during the burst. Logins turned away because the password queue was full
+are counted as refused. The database is a temporary file.
+"""
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+DEFAULT_THREADS = [4, 16]
+USERS = 20
+SECONDS = 5
+
+
+def percentile(samples, fraction):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * fraction))] * 1000
+
+
+def run(app, threads, seconds):
+    logins, refused, pages = [], [], []
+    stop = time.perf_counter() + seconds
+
+    def log_in(n):
+        client = app.test_client()
+        while time.perf_counter() < stop:
+            started = time.perf_counter()
+            response = client.post('/login', data={
+                'username': 'user{}'.format(n % USERS), 'password': 'pw', 'type': 'Login'})
+            if response.headers['Location'] == '/':
+                logins.append(time.perf_counter() - started)
+            else:
+                # the password queue was full (see db/passwords.py)
+                refused.append(time.perf_counter() - started)
+
+    def browse():
+        client = app.test_client()
+        while time.perf_counter() < stop:
+            started = time.perf_counter()
+            client.get('/loginscreen')
+            pages.append(time.perf_counter() - started)
+
+    workers = [threading.Thread(target=log_in, args=(n,)) for n in range(threads)]
+    workers.append(threading.Thread(target=browse))
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return logins, refused, pages
+
+
+def main(thread_counts):
+    from db import helpers, passwords, users
+    helpers.DB_PATH = os.path.join(tempfile.mkdtemp(), 'db.json')
+    import youface
+    app = youface.app
+    app.config['WTF_CSRF_ENABLED'] = False
+    for limiter in app.extensions['limiter']:
+        limiter.enabled = False
+
+    db = helpers.load_db()
+    for n in range(USERS):
+        users.new_user(db, 'user{}'.format(n), 'pw')
+
+    workers = passwords.WORKERS
+    print('{:>8} {:>8} {:>10} {:>8} {:>10} {:>10} {:>12}'.format(
+        'mode', 'threads', 'logins/s', 'refused', 'p50 ms', 'p99 ms', 'page p99 ms'))
+    for threads in thread_counts:
+        for mode, count in (('inline', 0), ('pool', workers)):
+            passwords.WORKERS = count
+            logins, refused, pages = run(app, threads, SECONDS)
+            print('{:>8} {:>8} {:>10.1f} {:>8} {:>10.1f} {:>10.1f} {:>12.1f}'.format(
+                mode, threads, len(logins) / SECONDS, len(refused), statistics.median(logins) * 1000,
+                percentile(logins, 0.99), percentile(pages, 0.99)))
+    passwords.shutdown()
+    helpers.close_db()
+
+
+if __name__ == '__main__':
+    main([int(arg) for arg in sys.argv[1:]] or DEFAULT_THREADS)
@@ -0,0 +1,72 @@
+"""Time rendering a page of feed post cards with and without the fragment cache.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_post_cards [PAGE_SIZE ...]
+
+Page sizes default to 20 and 100 posts. "cold" renders every card, "warm"
+serves every card from the cache and "one new" is a warm page with one new
+post at the top, as after a friend posts.
+"""
+import sys
+import time
+
+import flask
+from tinydb.table import Document
+
+from handlers import fragments, images, posts
+
+DEFAULT_SIZES = [20, 100]
+ROUNDS = 50
+
+
+def make_app():
+    app = flask.Flask('youface', root_path='.', template_folder='templates')
+    app.jinja_env.filters['variant'] = images.variant_url
+    app.jinja_env.filters['srcset'] = images.srcset
+    app.jinja_env.globals['post_card'] = fragments.post_card
+    # the like buttons link to the like and unlike routes
+    app.register_blueprint(posts.blueprint)
+    return app
+
+
+def make_posts(size, start=1):
+    return [Document({'user': 'user{}'.format(i % 50), 'text': 'honk ' * 20,
+                      'time': float(i), 'image': '/static/uploads/blobs/ab/{:064x}.jpg'.format(i)},
+                     doc_id=i) for i in range(start, start + size)]
+
+
+def timed(render):
+    started = time.perf_counter()
+    for _ in range(ROUNDS):
+        render()
+    return (time.perf_counter() - started) / ROUNDS * 1000
+
+
+def main(sizes):
+    app = make_app()
+    print('{:>6} {:>10} {:>10} {:>10}'.format('posts', 'cold ms', 'warm ms', 'one new ms'))
+    with app.test_request_context():
+        for size in sizes:
+            page = make_posts(size)
+
+            def cold():
+                fragments.cache.clear()
+                flask.render_template('post_cards.html', posts=page, likes={})
+
+            def warm():
+                flask.render_template('post_cards.html', posts=page, likes={})
+
+            new_posts = iter(range(10 ** 6, 10 ** 7))
+
+            def one_new():
+                post = make_posts(1, start=next(new_posts))
+                flask.render_template('post_cards.html', posts=post + page[:-1], likes={})
+
+            cold_ms = timed(cold)
+            warm()
+            print('{:>6} {:>10.2f} {:>10.2f} {:>10.2f}'.format(size, cold_ms, timed(warm), timed(one_new)))
+
+
+if __name__ == '__main__':
+    main([int(arg) for arg in sys.argv[1:]] or DEFAULT_SIZES)
@@ -0,0 +1,58 @@
+"""Compare username lookups through the username index with a full scan.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_username_index [SIZE ...]
+
+Sizes default to 10k, 100k and 1M users. The database is kept in memory so
+only lookup cost is measured.
+"""
+import random
+import sys
+import time
+
+import tinydb
+from tinydb.storages import MemoryStorage
+
+from db import helpers, users
+from db.storage import BatchingMiddleware
+
+DEFAULT_SIZES = [10_000, 100_000, 1_000_000]
+
+
+def make_db(size):
+    db = helpers.SharedTinyDB(storage=BatchingMiddleware(MemoryStorage))
+    db.table('users').insert_multiple(
+        {'username': 'user{}'.format(i), 'friends': [], 'profile': {}}
+        for i in range(size))
+    return db
+
+
+def time_lookups(lookup, names):
+    start = time.perf_counter()
+    for name in names:
+        assert lookup(name) is not None
+    return (time.perf_counter() - start) / len(names)
+
+
+def main(sizes):
+    print('{:>10} {:>14} {:>14} {:>10}'.format('users', 'indexed (us)', 'scan (us)', 'speedup'))
+    for size in sizes:
+        db = make_db(size)
+        table = db.table('users')
+        User = tinydb.Query()
+        names = ['user{}'.format(random.randrange(size)) for _ in range(1000)]
+
+        # build the index outside the timed section
+        users.get_user_by_name(db, names[0])
+        indexed = time_lookups(lambda name: users.get_user_by_name(db, name), names)
+        scan = time_lookups(lambda name: table.get(User.username == name),
+                            names[:max(3, 100_000 // size)])
+
+        print('{:>10} {:>14.2f} {:>14.2f} {:>9.0f}x'.format(
+            size, indexed * 1e6, scan * 1e6, scan / indexed))
+        db.close()
+
+
+if __name__ == '__main__':
+    main([int(arg) for arg in sys.argv[1:]] or DEFAULT_SIZES)
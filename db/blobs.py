@@ -0,0 +1,123 @@
+# db/blobs.py
+import hashlib
+import os
+import tempfile
+
+from .helpers import transaction
+from .indexes import lookup
+
+# Uploaded files are stored once per distinct content, named after the
+# SHA-256 of their bytes:
+#   static/uploads/blobs/<first two hex digits>/<digest><ext>
+# Every blob has one document in the 'blobs' table:
+#   {"digest": ..., "ext": ".jpg", "refs": <number of posts and photos using it>}
+# and is deleted, together with any files derived from it (named
+# <digest>.<something>, like resized images), when its last reference is
+# released. A blob's URL always names the same bytes, so it can be cached
+# forever.
+
+#: Directory blobs are stored under
+BLOB_DIR = os.path.join('static', 'uploads', 'blobs')
+
+#: URL prefix blobs are served under
+BLOB_URL = '/static/uploads/blobs/'
+
+#: Bytes read from an upload at a time
+CHUNK_SIZE = 64 * 1024
+
+
+def _by_digest(blobs, digest):
+    found = lookup(blobs, 'digest', lambda b: b['digest'], digest)
+    return found[0] if found else None
+
+
+def blob_path(digest, ext):
+    return os.path.join(BLOB_DIR, digest[:2], digest + ext)
+
+
+def blob_url(digest, ext):
+    return '{}{}/{}{}'.format(BLOB_URL, digest[:2], digest, ext)
+
+
+def path_of(url):
+    """The file path of the blob at ``url``."""
+    return url.lstrip('/')
+
+
+def write_temp(stream):
+    """Copy ``stream`` into a temporary file next to the blobs, hashing it
+    on the way. Returns the temporary path and the hex digest."""
+    os.makedirs(BLOB_DIR, exist_ok=True)
+    digest = hashlib.sha256()
+    fd, tmp_path = tempfile.mkstemp(dir=BLOB_DIR, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            for chunk in iter(lambda: stream.read(CHUNK_SIZE), b''):
+                digest.update(chunk)
+                f.write(chunk)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+    return tmp_path, digest.hexdigest()
+
+
+def add_blob(db, tmp_path, digest, ext):
+    """Move the temporary file ``tmp_path`` holding the bytes with ``digest``
+    into the store and take a reference to it.
+
+    If the store already has these bytes the temporary file is dropped.
+    Returns the blob's URL and whether it is new.
+    """
+    blobs = db.table('blobs')
+    path = blob_path(digest, ext)
+    with transaction(db):
+        existing = _by_digest(blobs, digest)
+        if existing is not None and os.path.exists(blob_path(digest, existing['ext'])):
+            os.remove(tmp_path)
+            blobs.update({'refs': existing['refs'] + 1}, doc_ids=[existing.doc_id])
+            return blob_url(digest, existing['ext']), False
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(tmp_path, path)
+        if existing is not None:
+            blobs.update({'ext': ext, 'refs': existing['refs'] + 1}, doc_ids=[existing.doc_id])
+        else:
+            blobs.insert({'digest': digest, 'ext': ext, 'refs': 1})
+    return blob_url(digest, ext), True
+
+
+def store(db, stream, ext):
+    """Store the contents of ``stream`` as a blob and take a reference to it.
+
+    Returns the blob's URL and whether it is new.
+    """
+    tmp_path, digest = write_temp(stream)
+    return add_blob(db, tmp_path, digest, ext.lower())
+
+
+def release(db, url):
+    """Drop a reference to the blob at ``url``, deleting it once nothing
+    refers to it. Other URLs are ignored."""
+    if not url or not url.startswith(BLOB_URL):
+        return
+    digest = os.path.splitext(os.path.basename(url))[0]
+    blobs = db.table('blobs')
+    with transaction(db):
+        blob = _by_digest(blobs, digest)
+        if blob is None:
+            return
+        if blob['refs'] > 1:
+            blobs.update({'refs': blob['refs'] - 1}, doc_ids=[blob.doc_id])
+            return
+        blobs.remove(doc_ids=[blob.doc_id])
+        directory = os.path.dirname(blob_path(digest, blob['ext']))
+        for name in os.listdir(directory) if os.path.isdir(directory) else ():
+            if name.startswith(digest):
+                os.remove(os.path.join(directory, name))
+
+
+def refs(db, url):
+    """The number of references to the blob at ``url``."""
+    digest = os.path.splitext(os.path.basename(url))[0]
+    blob = _by_digest(db.table('blobs'), digest)
+    return 0 if blob is None else blob['refs']
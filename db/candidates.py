@@ -0,0 +1,190 @@
+# db/candidates.py
+import collections
+import math
+import random
+
+from .helpers import transaction
+from .indexes import get_index
+from .matches import has_swiped
+from .users import get_usernames, get_users_by_name_list, user_exists
+
+#: Number of candidates shuffled into a user's deck at a time
+CHUNK_SIZE = 20
+
+#: Number of users whose decks are kept in memory
+MAX_QUEUES = 1000
+
+#: Number of usernames all cached decks may hold between them
+MAX_NAMES = 100_000
+
+
+def _stride(size):
+    """A random step that is coprime with ``size``, so stepping through
+    ``range(size)`` with it (mod ``size``) visits every position once."""
+    if size < 2:
+        return 1
+    while True:
+        stride = random.randrange(1, size)
+        if math.gcd(stride, size) == 1:
+            return stride
+
+
+class CandidateQueue:
+    """The swipe deck of one user.
+
+    Every deck deals from the same list of usernames (see
+    :class:`CandidateCache`), each in its own order: position
+    ``(offset + k * stride) % size`` for k = 0, 1, ..., with a random offset
+    and stride, visits every name once without copying the list. ``size`` is
+    the length of the list when the deck was made; users who register later
+    are kept aside and dealt once the list runs out. The deck is refilled one
+    shuffled chunk at a time. Cards stay at the front of the deck until they
+    are swiped; stale cards (swiped or deleted users) are dropped whenever a
+    peek comes across them.
+    """
+
+    def __init__(self, names):
+        self._names = names
+        self._size = len(names)
+        self._offset = random.randrange(self._size) if self._size else 0
+        self._stride = _stride(self._size)
+        self._dealt = 0
+        self._joined = []
+        self._deck = collections.deque()
+
+    def __len__(self):
+        """The number of usernames the deck holds."""
+        return len(self._deck) + len(self._joined)
+
+    def add(self, username):
+        self._joined.append(username)
+
+    def peek(self, count, is_valid):
+        """Return up to ``count`` valid usernames from the front of the deck."""
+        found = []
+        position = 0
+        while len(found) < count:
+            if position == len(self._deck) and not self._deal():
+                break
+            username = self._deck[position]
+            if not is_valid(username):
+                del self._deck[position]
+                continue
+            found.append(username)
+            position += 1
+        return found
+
+    def _deal(self):
+        """Move a shuffled chunk of names onto the deck; False if none are left."""
+        chunk = []
+        while len(chunk) < CHUNK_SIZE:
+            if self._dealt < self._size:
+                name = self._names[(self._offset + self._dealt * self._stride) % self._size]
+                self._dealt += 1
+            elif self._joined:
+                name = self._joined.pop()
+            else:
+                break
+            if name is not None:
+                chunk.append(name)
+        random.shuffle(chunk)
+        self._deck.extend(chunk)
+        return bool(chunk)
+
+
+class CandidateCache:
+    """Swipe decks of the most recently active users.
+
+    Registered as an index on the users table. It keeps every username in
+    one list, in the order the users were added (a deleted user's slot is
+    set to ``None``), and all decks deal from it. A newly registered user is
+    added to every cached deck as soon as they are inserted. Decks are
+    evicted least recently used first once there are more than
+    :data:`MAX_QUEUES` of them or they hold more than :data:`MAX_NAMES`
+    usernames between them.
+    """
+
+    def __init__(self):
+        self._names = []
+        self._slots = {}
+        self._queues = collections.OrderedDict()
+        self._held = 0
+
+    def update(self, doc_id, doc):
+        slot = self._slots.get(doc_id)
+        if doc is None:
+            if slot is not None:
+                self._names[slot] = None
+                del self._slots[doc_id]
+            return
+        if slot is not None:
+            self._names[slot] = doc['username']
+            return
+        self._slots[doc_id] = len(self._names)
+        self._names.append(doc['username'])
+        for owner, queue in self._queues.items():
+            if doc['username'] != owner:
+                queue.add(doc['username'])
+                self._held += 1
+        self._evict()
+
+    def clear(self):
+        self._names = []
+        self._slots.clear()
+        self._queues.clear()
+        self._held = 0
+
+    def peek(self, username, count, is_valid):
+        """Return up to ``count`` valid usernames from the front of
+        ``username``'s deck, making the deck if it isn't cached."""
+        queue = self._queues.pop(username, None)
+        if queue is None:
+            queue = CandidateQueue(self._names)
+        else:
+            self._held -= len(queue)
+        found = queue.peek(count, is_valid)
+        self._queues[username] = queue
+        self._held += len(queue)
+        self._evict()
+        return found
+
+    def _evict(self):
+        while self._queues and (len(self._queues) > MAX_QUEUES or self._held > MAX_NAMES):
+            _, queue = self._queues.popitem(last=False)
+            self._held -= len(queue)
+
+
+def _cache(db):
+    return get_index(db.table('users'), 'candidates', CandidateCache)
+
+
+def next_candidates(db, username, count=1):
+    """Get the next ``count`` users ``username`` hasn't swiped on yet."""
+    def is_valid(name):
+        return (name != username and not has_swiped(db, username, name)
+                and user_exists(db, name))
+
+    cache = _cache(db)
+    if cache is None:
+        names = [name for name in get_usernames(db) if is_valid(name)]
+        random.shuffle(names)
+        names = names[:count]
+    else:
+        with transaction(db):
+            names = cache.peek(username, count, is_valid)
+
+    return get_users_by_name_list(db, names)
+
+
+def card(user):
+    """The public part of a user that is shown on a swipe card."""
+    profile = user.get('profile', {})
+    photos = profile.get('photos') or []
+    return {
+        'username': user['username'],
+        'bio': profile.get('bio', ''),
+        'shoe_size': profile.get('shoe_size'),
+        'is_clown': profile.get('is_clown', False),
+        'has_clown_horns': profile.get('has_clown_horns', False),
+        'photo': photos[0] if photos else None,
+    }
@@ -0,0 +1,91 @@
+"""Comments on posts.
+
+Each comment is a document in the ``comments`` table:
+    {"post": <post doc id>, "user": <username>, "text": ..., "time": <timestamp>}
+A :class:`~db.indexes.SortedIndex` groups them by post in time order, so a
+post's comments are read without looking at anybody else's, and the comment
+counts and latest comments of a whole feed page come from one call to
+:func:`comment_previews`.
+"""
+import itertools
+import time
+
+import tinydb
+
+from .helpers import transaction
+from .indexes import SortedIndex, get_index
+from .posts import _older_than
+
+#: Number of comments on one page of a post's comments
+PAGE_SIZE = 20
+
+#: Number of latest comments shown under each post in a feed
+PREVIEW_SIZE = 2
+
+#: Longest comment accepted, in characters
+MAX_LENGTH = 1000
+
+
+def _post_index(comments):
+    return get_index(comments, 'post', lambda: SortedIndex(
+        lambda comment: comment.get('post'), lambda comment: comment.get('time')))
+
+
+def add_comment(db, post_id, user, text):
+    """Add a comment by ``user`` (a user document) to the post ``post_id``.
+
+    Returns the comment's doc id, or ``None`` if there's no such post.
+    """
+    with transaction(db):
+        if not db.table('posts').contains(doc_id=post_id):
+            return None
+        return db.table('comments').insert({
+            'post': post_id,
+            'user': user['username'],
+            'text': text,
+            'time': time.time()
+        })
+
+
+def get_comments(db, post_id, limit=PAGE_SIZE, before=None):
+    """Get one page of a post's comments, newest first.
+
+    Pass the ``before`` cursor (see :func:`db.posts.make_cursor`) of the
+    previous page to get older comments.
+    """
+    comments = db.table('comments')
+    index = _post_index(comments)
+    if index is None:
+        found = filter(_older_than(before), comments.search(tinydb.Query().post == post_id))
+        return sorted(found, key=lambda comment: (comment['time'], comment.doc_id),
+                      reverse=True)[:limit]
+    with transaction(db):
+        return [comments.get(doc_id=doc_id)
+                for _, doc_id in itertools.islice(index.newest(post_id, before), limit)]
+
+
+def comment_previews(db, post_ids, latest=PREVIEW_SIZE):
+    """Return ``{post_id: (comment_count, latest_comments)}`` for every post
+    in ``post_ids``, such as a page of a feed.
+
+    ``latest_comments`` holds up to ``latest`` of the newest comments, oldest
+    first as they're shown.
+    """
+    comments = db.table('comments')
+    index = _post_index(comments)
+    if index is None:
+        found = {post_id: [] for post_id in post_ids}
+        for comment in comments.search(tinydb.Query().post.one_of(list(found))):
+            found[comment['post']].append(comment)
+        previews = {}
+        for post_id, post_comments in found.items():
+            post_comments.sort(key=lambda comment: (comment['time'], comment.doc_id))
+            previews[post_id] = (len(post_comments), post_comments[max(0, len(post_comments) - latest):])
+        return previews
+    with transaction(db):
+        previews = {}
+        for post_id in post_ids:
+            newest = itertools.islice(index.newest(post_id), latest)
+            previews[post_id] = (index.count(post_id),
+                                 [comments.get(doc_id=doc_id) for _, doc_id in newest][::-1])
+        return previews
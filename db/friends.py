@@ -0,0 +1,197 @@
+"""The friendship graph.
+
+Friendships are stored as the list of friend usernames in each user
+document. :class:`FriendGraph` is kept on the users table as an index (see
+:mod:`db.indexes`) and holds the same edges as sets of doc ids in both
+directions, so membership tests, mutual friend counts and friend-of-friend
+suggestions never have to scan friend lists.
+
+Friendships are one-way: adding someone as a friend doesn't make you
+theirs, and the friends page lists only the people you added. A symmetric
+graph would show friendships nobody made, so the graph keeps the edges in
+both directions instead. The reverse edges answer "who added this user" in
+O(1), which deleting a user needs (see :func:`followers`).
+"""
+import heapq
+
+from .helpers import transaction
+from .indexes import get_index
+
+#: Number of friend suggestions shown on /find-friends
+SUGGESTION_LIMIT = 5
+
+
+class FriendGraph:
+    """Friend edges between users, by doc id.
+
+    ``_out[a]`` holds the ids of the users ``a`` has added as friends and
+    ``_in[b]`` the ids of the users who have added ``b``. A friend name
+    whose document hasn't been loaded yet (or was removed) is remembered
+    and linked up once a user with that name arrives.
+    """
+
+    def __init__(self):
+        self._ids = {}
+        self._names = {}
+        self._out = {}
+        self._in = {}
+        # username -> ids of users listing it before it was loaded
+        self._waiting = {}
+        # doc id -> names that user lists which aren't loaded
+        self._pending = {}
+
+    def update(self, doc_id, doc):
+        self._discard(doc_id)
+        if doc is None or not doc.get('username'):
+            return
+        name = doc['username']
+        self._ids[name] = doc_id
+        self._names[doc_id] = name
+        self._out[doc_id] = set()
+        for friend in doc.get('friends') or ():
+            if friend != name:
+                self._link(doc_id, friend)
+
+        for owner in self._waiting.pop(name, ()):
+            self._pending_discard(owner, name)
+            self._out[owner].add(doc_id)
+            self._in.setdefault(doc_id, set()).add(owner)
+
+    def clear(self):
+        for mapping in (self._ids, self._names, self._out, self._in,
+                        self._waiting, self._pending):
+            mapping.clear()
+
+    def contains(self, username, friend):
+        """Whether ``username`` has added ``friend``."""
+        user_id, friend_id = self._ids.get(username), self._ids.get(friend)
+        if user_id is None or friend_id is None:
+            return False
+        return friend_id in self._out[user_id]
+
+    def followers(self, username):
+        """The names of the users who have added ``username``."""
+        return [self._names[doc_id] for doc_id in self._in.get(self._ids.get(username), ())]
+
+    def mutual_counts(self, username, others):
+        """Return how many friends ``username`` shares with each of ``others``."""
+        mine = self._out.get(self._ids.get(username), set())
+        counts = {}
+        for other in others:
+            theirs = self._out.get(self._ids.get(other), set())
+            small, large = sorted((mine, theirs), key=len)
+            counts[other] = sum(1 for doc_id in small if doc_id in large)
+        return counts
+
+    def suggestions(self, username, limit):
+        """Return up to ``limit`` ``(name, mutual_count)`` pairs of users that
+        ``username``'s friends have added but ``username`` hasn't, most
+        shared friends first."""
+        user_id = self._ids.get(username)
+        if user_id is None:
+            return []
+        mine = self._out[user_id]
+        scores = {}
+        for friend_id in mine:
+            for candidate in self._out.get(friend_id, ()):
+                if candidate != user_id and candidate not in mine:
+                    scores[candidate] = scores.get(candidate, 0) + 1
+        best = heapq.nsmallest(limit, scores.items(),
+                               key=lambda item: (-item[1], self._names[item[0]]))
+        return [(self._names[doc_id], count) for doc_id, count in best]
+
+    def _link(self, owner, friend):
+        friend_id = self._ids.get(friend)
+        if friend_id is None:
+            self._waiting.setdefault(friend, set()).add(owner)
+            self._pending.setdefault(owner, set()).add(friend)
+        else:
+            self._out[owner].add(friend_id)
+            self._in.setdefault(friend_id, set()).add(owner)
+
+    def _pending_discard(self, owner, name):
+        names = self._pending.get(owner)
+        if names is not None:
+            names.discard(name)
+            if not names:
+                del self._pending[owner]
+
+    def _discard(self, doc_id):
+        name = self._names.pop(doc_id, None)
+        if name is None:
+            return
+        if self._ids.get(name) == doc_id:
+            del self._ids[name]
+        for friend_id in self._out.pop(doc_id, ()):
+            followers = self._in[friend_id]
+            followers.discard(doc_id)
+            if not followers:
+                del self._in[friend_id]
+        for friend in self._pending.pop(doc_id, ()):
+            owners = self._waiting[friend]
+            owners.discard(doc_id)
+            if not owners:
+                del self._waiting[friend]
+        # users who added this one keep its name in their friend lists
+        for owner in self._in.pop(doc_id, ()):
+            self._out[owner].discard(doc_id)
+            self._waiting.setdefault(name, set()).add(owner)
+            self._pending.setdefault(owner, set()).add(name)
+
+
+def _graph(db):
+    return get_index(db.table('users'), 'friends', FriendGraph)
+
+
+def _friend_lists(db):
+    return {user['username']: set(user.get('friends') or ()) for user in db.table('users')}
+
+
+def is_friend(db, user, friend):
+    """Whether ``user`` (a user document) has added ``friend``."""
+    graph = _graph(db)
+    if graph is None:
+        # the stored list; the caller's copy may be out of date
+        current = db.table('users').get(doc_id=user.doc_id) or user
+        return friend in current['friends']
+    with transaction(db):
+        return graph.contains(user['username'], friend)
+
+
+def followers(db, username):
+    """Return the names of the users who have added ``username`` as a friend."""
+    graph = _graph(db)
+    if graph is None:
+        return [user['username'] for user in db.table('users')
+                if username in (user.get('friends') or ())]
+    with transaction(db):
+        return graph.followers(username)
+
+
+def mutual_friend_counts(db, username, others):
+    """Return ``{name: count}`` of the friends ``username`` shares with each
+    of the users named in ``others``."""
+    graph = _graph(db)
+    if graph is None:
+        lists = _friend_lists(db)
+        mine = lists.get(username, set())
+        return {other: len(mine & lists.get(other, set())) for other in others}
+    with transaction(db):
+        return graph.mutual_counts(username, others)
+
+
+def suggest_friends(db, username, limit=SUGGESTION_LIMIT):
+    """Suggest friends of ``username``'s friends, as ``(name, mutual_count)``
+    pairs, most mutual friends first."""
+    graph = _graph(db)
+    if graph is None:
+        lists = _friend_lists(db)
+        mine = lists.get(username, set())
+        scores = {}
+        for friend in mine:
+            for candidate in lists.get(friend, ()):
+                if candidate != username and candidate not in mine and candidate in lists:
+                    scores[candidate] = scores.get(candidate, 0) + 1
+        return heapq.nsmallest(limit, scores.items(), key=lambda item: (-item[1], item[0]))
+    with transaction(db):
+        return graph.suggestions(username, limit)
@@ -1,4 +1,158 @@
+import atexit
+import contextlib
+import functools
+import threading
+
 import tinydb
+from tinydb.table import Table
+
+from .storage import BatchingMiddleware, LogStorage
+
+DB_PATH = 'db.json'
+
+_db = None
+_db_lock = threading.Lock()
+
+
+def _locked(method):
+    """Run a table method while holding the database lock."""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._storage.lock:
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
+def _mutation(method):
+    """Run a table method under the lock and record the documents it changed."""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._storage.tracked():
+            result = method(self, *args, **kwargs)
+            self._changed(result if isinstance(result, list) else [result])
+            return result
+    return wrapper
+
+
+class SharedTable(Table):
+    """A table that is safe to use from several request threads at once.
+
+    Every insert, update and remove reports the documents it touched to the
+    storage so they can be logged individually instead of rewriting the file,
+    and to the table's indexes (see :mod:`db.indexes`) so they stay current.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._indexes = {}
+
+    insert = _mutation(Table.insert)
+    insert_multiple = _mutation(Table.insert_multiple)
+    update = _mutation(Table.update)
+    update_multiple = _mutation(Table.update_multiple)
+    # upsert is made of update and insert, which already record themselves
+    upsert = _locked(Table.upsert)
+    remove = _mutation(Table.remove)
+    search = _locked(Table.search)
+    get = _locked(Table.get)
+    contains = _locked(Table.contains)
+    count = _locked(Table.count)
+    __len__ = _locked(Table.__len__)
+
+    def __iter__(self):
+        # Materialise the documents under the lock so a concurrent writer
+        # can't resize the table dict while we walk it.
+        with self._storage.lock:
+            docs = list(super().__iter__())
+        return iter(docs)
+
+    def truncate(self):
+        with self._storage.tracked():
+            super().truncate()
+            self._storage.record('clear', self.name)
+            for index in self._indexes.values():
+                index.clear()
+
+    def index(self, name, factory):
+        """Return the index called ``name``, building it with ``factory()``
+        from the current documents on first use."""
+        with self._storage.lock:
+            index = self._indexes.get(name)
+            if index is None:
+                index = factory()
+                for doc_id, doc in self._read_table().items():
+                    index.update(int(doc_id), doc)
+                self._indexes[name] = index
+            return index
+
+    def _changed(self, doc_ids):
+        table = self._read_table()
+        for doc_id in doc_ids:
+            doc = table.get(str(doc_id))
+            if doc is None:
+                self._storage.record('del', self.name, doc_id)
+            else:
+                self._storage.record('set', self.name, doc_id, doc)
+            for index in self._indexes.values():
+                index.update(doc_id, doc)
+
+
+class SharedTinyDB(tinydb.TinyDB):
+    """The process-wide database, kept in memory and flushed in batches."""
+
+    table_class = SharedTable
+
+    def drop_table(self, name):
+        with self.storage.tracked():
+            super().drop_table(name)
+            self.storage.record('drop', name)
+
+    def drop_tables(self):
+        with self.storage.tracked():
+            super().drop_tables()
+            self.storage.record('drop', None)
+
+    @property
+    def lock(self):
+        return self.storage.lock
+
+    def flush(self):
+        self.storage.flush()
+
+
+def transaction(db):
+    """Hold the database lock so a group of operations runs as one unit.
+
+    For a plain TinyDB (as used by the tests) this is a no-op.
+    """
+    lock = getattr(db, 'lock', None)
+    if lock is None:
+        return contextlib.nullcontext()
+    return lock
+
 
 def load_db():
-    return tinydb.TinyDB('db.json', sort_keys=True, indent=4, separators=(',', ': '))
+    """Return the shared database, opening it on first use."""
+    global _db
+    with _db_lock:
+        if _db is None:
+            _db = SharedTinyDB(DB_PATH, storage=BatchingMiddleware(LogStorage),
+                    sort_keys=True, indent=4, separators=(',', ': '))
+    return _db
+
+
+def flush_db():
+    """Write any pending changes to disk."""
+    with _db_lock:
+        if _db is not None:
+            _db.flush()
+
+
+@atexit.register
+def close_db():
+    """Flush and close the shared database."""
+    global _db
+    with _db_lock:
+        if _db is not None:
+            _db.close()
+            _db = None
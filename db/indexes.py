@@ -0,0 +1,267 @@
+"""In-memory secondary indexes kept up to date by :class:`db.helpers.SharedTable`.
+
+An index is built once from the table's documents and from then on the table
+calls ``update(doc_id, doc)`` after every change (``doc`` is ``None`` when the
+document was removed) and ``clear()`` when the table is truncated.
+"""
+import bisect
+import heapq
+
+
+def get_index(table, name, factory):
+    """Return the index called ``name`` on ``table``, building it on first use.
+
+    Returns ``None`` for plain TinyDB tables, which can't keep indexes up to
+    date; callers should fall back to a query in that case.
+    """
+    index = getattr(table, 'index', None)
+    if index is None:
+        return None
+    return index(name, factory)
+
+
+class HashIndex:
+    """Maps a key computed from each document to the ids of matching documents.
+
+    ``key`` is called with each document and returns the value to index it
+    under, or ``None`` to leave the document out of the index.
+    """
+
+    def __init__(self, key):
+        self._key = key
+        self._ids = {}
+        self._keys = {}
+
+    def update(self, doc_id, doc):
+        self._discard(doc_id)
+        if doc is None:
+            return
+        key = self._key(doc)
+        if key is None:
+            return
+        self._keys[doc_id] = key
+        self._ids.setdefault(key, set()).add(doc_id)
+
+    def clear(self):
+        self._ids.clear()
+        self._keys.clear()
+
+    def get(self, key):
+        """Return the set of doc ids indexed under ``key``."""
+        return set(self._ids.get(key, ()))
+
+    def first(self, key):
+        """Return one doc id indexed under ``key``, or ``None``."""
+        ids = self._ids.get(key)
+        if not ids:
+            return None
+        return next(iter(ids))
+
+    def count(self, key):
+        return len(self._ids.get(key, ()))
+
+    def keys(self):
+        """Return a list of every key in the index."""
+        return list(self._ids)
+
+    def contains(self, key, doc_id):
+        return doc_id in self._ids.get(key, ())
+
+    def _discard(self, doc_id):
+        key = self._keys.pop(doc_id, None)
+        if key is None:
+            return
+        ids = self._ids[key]
+        ids.discard(doc_id)
+        if not ids:
+            del self._ids[key]
+
+
+class SortedIndex:
+    """Keeps the ids of each group of documents ordered by a sort key.
+
+    ``group`` and ``key`` are called with each document; documents for which
+    either returns ``None`` are left out. The doc id is appended to the sort
+    key so entries are unique and can be used as pagination cursors.
+    """
+
+    def __init__(self, group, key):
+        self._group = group
+        self._key = key
+        self._groups = {}
+        self._entries = {}
+
+    def update(self, doc_id, doc):
+        self._discard(doc_id)
+        if doc is None:
+            return
+        group, key = self._group(doc), self._key(doc)
+        if group is None or key is None:
+            return
+        entry = (key, doc_id)
+        self._entries[doc_id] = (group, entry)
+        bisect.insort(self._groups.setdefault(group, []), entry)
+
+    def clear(self):
+        self._groups.clear()
+        self._entries.clear()
+
+    def newest(self, group, before=None):
+        """Yield ``(key, doc_id)`` entries of ``group``, newest first.
+
+        If ``before`` is given, only entries strictly older than that
+        ``(key, doc_id)`` cursor are produced.
+        """
+        entries = self._groups.get(group, [])
+        end = len(entries) if before is None else bisect.bisect_left(entries, tuple(before))
+        for i in range(end - 1, -1, -1):
+            yield entries[i]
+
+    def oldest(self, group, after=None):
+        """Yield ``(key, doc_id)`` entries of ``group``, oldest first.
+
+        If ``after`` is given, only entries strictly newer than that
+        ``(key, doc_id)`` cursor are produced.
+        """
+        entries = self._groups.get(group, [])
+        start = 0 if after is None else bisect.bisect_right(entries, tuple(after))
+        for i in range(start, len(entries)):
+            yield entries[i]
+
+    def count_at_least(self, group, low):
+        entries = self._groups.get(group, [])
+        return len(entries) - bisect.bisect_left(entries, (low,))
+
+    def key_of(self, doc_id):
+        """Return the sort key ``doc_id`` is indexed under, or ``None``."""
+        found = self._entries.get(doc_id)
+        return None if found is None else found[1][0]
+
+    def count(self, group):
+        return len(self._groups.get(group, ()))
+
+    def _discard(self, doc_id):
+        found = self._entries.pop(doc_id, None)
+        if found is None:
+            return
+        group, entry = found
+        entries = self._groups[group]
+        del entries[bisect.bisect_left(entries, entry)]
+        if not entries:
+            del self._groups[group]
+
+
+def match_rank(name, query):
+    """Rank how well the lowercased ``name`` matches ``query``; lower is better.
+
+    Exact matches come first, then names starting with the query, then names
+    containing it (earlier occurrences first), ties broken alphabetically.
+    Returns ``None`` if ``query`` doesn't occur in ``name`` at all.
+    """
+    position = name.find(query)
+    if position < 0:
+        return None
+    if name == query:
+        kind = 0
+    elif position == 0:
+        kind = 1
+    else:
+        kind = 2
+    return (kind, position, name)
+
+
+class TrigramIndex:
+    """A case-insensitive substring search over one text field.
+
+    Each lowercased value is broken into its three-letter substrings and the
+    index keeps the set of doc ids containing each of them. A query is looked
+    up by intersecting the sets of its own trigrams and checking the few
+    survivors. The values are also kept sorted, so values starting with the
+    query (which outrank every other match) are read off in rank order after
+    a bisect; when they fill the requested number of results the trigrams
+    aren't consulted at all. Queries shorter than three characters only match
+    at the start of a value.
+    """
+
+    def __init__(self, key):
+        self._key = key
+        self._values = {}
+        self._grams = {}
+        self._sorted = []
+
+    @staticmethod
+    def _trigrams(text):
+        return {text[i:i + 3] for i in range(len(text) - 2)}
+
+    def update(self, doc_id, doc):
+        value = None if doc is None else self._key(doc)
+        value = value.lower() if value else None
+        if self._values.get(doc_id) == value:
+            return
+        self._discard(doc_id)
+        if value is None:
+            return
+        self._values[doc_id] = value
+        bisect.insort(self._sorted, (value, doc_id))
+        for gram in self._trigrams(value):
+            self._grams.setdefault(gram, set()).add(doc_id)
+
+    def clear(self):
+        self._values.clear()
+        self._grams.clear()
+        self._sorted.clear()
+
+    def search(self, query, limit):
+        """Return the ids of the best ``limit`` documents containing ``query``,
+        best match first (see :func:`match_rank`)."""
+        query = query.lower()
+        if not query or limit <= 0:
+            return []
+
+        found = {}
+        start = bisect.bisect_left(self._sorted, (query,))
+        for value, doc_id in self._sorted[start:start + limit]:
+            if not value.startswith(query):
+                break
+            found[doc_id] = match_rank(value, query)
+        if len(found) < limit and len(query) >= 3:
+            for doc_id in self._containing(query):
+                if doc_id not in found:
+                    rank = match_rank(self._values[doc_id], query)
+                    if rank is not None:
+                        found[doc_id] = rank
+
+        best = heapq.nsmallest(limit, found.items(), key=lambda item: (item[1], item[0]))
+        return [doc_id for doc_id, _ in best]
+
+    def _containing(self, query):
+        """Doc ids whose value has every trigram of ``query``."""
+        postings = sorted((self._grams.get(gram, set()) for gram in self._trigrams(query)),
+                          key=len)
+        if not postings[0]:
+            return set()
+        return postings[0].intersection(*postings[1:])
+
+    def _discard(self, doc_id):
+        value = self._values.pop(doc_id, None)
+        if value is None:
+            return
+        del self._sorted[bisect.bisect_left(self._sorted, (value, doc_id))]
+        for gram in self._trigrams(value):
+            ids = self._grams[gram]
+            ids.discard(doc_id)
+            if not ids:
+                del self._grams[gram]
+
+
+def lookup(table, name, key, value):
+    """Return the documents of ``table`` for which ``key(doc) == value``.
+
+    Uses (and builds on first use) the :class:`HashIndex` called ``name``, or
+    scans the table if it can't keep indexes.
+    """
+    index = get_index(table, name, lambda: HashIndex(key))
+    if index is None:
+        return table.search(lambda doc: key(doc) == value)
+    found = (table.get(doc_id=doc_id) for doc_id in index.get(value))
+    return [doc for doc in found if doc is not None]
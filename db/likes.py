@@ -0,0 +1,143 @@
+"""Likes on posts.
+
+Each like is a document in the ``likes`` table:
+    {"post": <post doc id>, "user": <username>}
+:class:`LikeIndex` is kept on that table as an index (see :mod:`db.indexes`)
+and holds a like count for every post and the set of posts every user has
+liked. Showing a page of posts with their counts and whether the viewer
+liked each one is then a dict lookup per post, however many likes there are.
+"""
+import collections
+
+import tinydb
+
+from .helpers import transaction
+from .indexes import get_index
+
+#: What a post nobody has liked looks like in :func:`like_states`
+NO_LIKES = (0, False)
+
+
+class LikeIndex:
+    """Like counts by post id and liked post ids by username."""
+
+    def __init__(self):
+        self._counts = collections.Counter()
+        self._liked = {}
+        # doc id -> (post id, username), and back
+        self._likes = {}
+        self._ids = {}
+
+    def update(self, doc_id, doc):
+        self._discard(doc_id)
+        if doc is None or doc.get('post') is None or not doc.get('user'):
+            return
+        like = (doc['post'], doc['user'])
+        self._likes[doc_id] = like
+        self._ids[like] = doc_id
+        self._counts[like[0]] += 1
+        self._liked.setdefault(like[1], set()).add(like[0])
+
+    def clear(self):
+        for mapping in (self._counts, self._liked, self._likes, self._ids):
+            mapping.clear()
+
+    def count(self, post_id):
+        return self._counts.get(post_id, 0)
+
+    def has_liked(self, username, post_id):
+        return post_id in self._liked.get(username, ())
+
+    def doc_id_of(self, post_id, username):
+        """The doc id of ``username``'s like of ``post_id``, or ``None``."""
+        return self._ids.get((post_id, username))
+
+    def states(self, post_ids, username):
+        liked = self._liked.get(username, ())
+        return {post_id: (self._counts.get(post_id, 0), post_id in liked)
+                for post_id in post_ids}
+
+    def _discard(self, doc_id):
+        like = self._likes.pop(doc_id, None)
+        if like is None:
+            return
+        if self._ids.get(like) == doc_id:
+            del self._ids[like]
+        self._counts[like[0]] -= 1
+        if not self._counts[like[0]]:
+            del self._counts[like[0]]
+        posts = self._liked[like[1]]
+        posts.discard(like[0])
+        if not posts:
+            del self._liked[like[1]]
+
+
+def _index(db):
+    return get_index(db.table('likes'), 'likes', LikeIndex)
+
+
+def _find(db, post_id, username):
+    """The doc ids of ``username``'s likes of ``post_id``."""
+    index = _index(db)
+    if index is None:
+        Like = tinydb.Query()
+        return [like.doc_id for like in
+                db.table('likes').search((Like.post == post_id) & (Like.user == username))]
+    doc_id = index.doc_id_of(post_id, username)
+    return [] if doc_id is None else [doc_id]
+
+
+def count(db, post_id):
+    """The number of likes of the post ``post_id``."""
+    index = _index(db)
+    if index is None:
+        return db.table('likes').count(tinydb.Query().post == post_id)
+    with transaction(db):
+        return index.count(post_id)
+
+
+def like_post(db, post_id, username):
+    """Like the post ``post_id`` as ``username``.
+
+    Liking a post twice counts once. Returns the post's like count, or
+    ``None`` if there's no such post.
+    """
+    with transaction(db):
+        if not db.table('posts').contains(doc_id=post_id):
+            return None
+        if not _find(db, post_id, username):
+            db.table('likes').insert({'post': post_id, 'user': username})
+        return count(db, post_id)
+
+
+def unlike_post(db, post_id, username):
+    """Take back ``username``'s like of the post ``post_id``, if any.
+
+    Returns the post's like count, or ``None`` if there's no such post.
+    """
+    with transaction(db):
+        if not db.table('posts').contains(doc_id=post_id):
+            return None
+        found = _find(db, post_id, username)
+        if found:
+            db.table('likes').remove(doc_ids=found)
+        return count(db, post_id)
+
+
+def like_states(db, post_ids, username):
+    """Return ``{post_id: (like_count, liked_by_username)}`` for every post in
+    ``post_ids``, such as a page of a feed."""
+    index = _index(db)
+    if index is None:
+        states = dict.fromkeys(post_ids, NO_LIKES)
+        for like in db.table('likes').search(tinydb.Query().post.one_of(list(states))):
+            likes, liked = states[like['post']]
+            states[like['post']] = (likes + 1, liked or like['user'] == username)
+        return states
+    with transaction(db):
+        return index.states(post_ids, username)
+
+
+def forget_user(db, username):
+    """Remove every like ``username`` gave."""
+    db.table('likes').remove(tinydb.Query().user == username)
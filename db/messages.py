@@ -0,0 +1,50 @@
+import time
+
+from .helpers import transaction
+from .indexes import SortedIndex, get_index
+from .pubsub import broker
+
+def conversation_key(user, other):
+    """The key both directions of a conversation are filed under."""
+    return tuple(sorted((user, other)))
+
+def _conversation_index(messages):
+    return get_index(messages, 'conversation', lambda: SortedIndex(
+        lambda m: conversation_key(m['sender'], m['receiver']),
+        lambda m: m.get('timestamp')))
+
+def add_message(db, sender, receiver, text):
+    """Send a message from sender to receiver.
+
+    The message is also published to anybody streaming the conversation.
+    """
+    messages = db.table('messages')
+    # stamp, store and publish under one lock so subscribers see messages
+    # in timestamp order
+    with transaction(db):
+        message = {
+            "sender": sender,
+            "receiver": receiver,
+            "text": text,
+            "timestamp": time.time()
+        }
+        doc_id = messages.insert(message)
+        broker.publish(conversation_key(sender, receiver), dict(message, id=doc_id))
+    return doc_id
+
+def get_conversation(db, user, other, since=None):
+    """Get the messages between two users, oldest first.
+
+    With ``since`` only the messages sent after that timestamp are returned.
+    """
+    messages = db.table('messages')
+    key = conversation_key(user, other)
+    index = _conversation_index(messages)
+    if index is None:
+        found = [m for m in messages.search(
+                    lambda m: conversation_key(m['sender'], m['receiver']) == key)
+                 if since is None or m['timestamp'] > since]
+        return sorted(found, key=lambda m: m['timestamp'])
+    after = None if since is None else (since, float('inf'))
+    with transaction(db):
+        return [messages.get(doc_id=doc_id) for _, doc_id in index.oldest(key, after)]
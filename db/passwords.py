@@ -0,0 +1,87 @@
+"""Password hashing off the request threads.
+
+Hashing a password on purpose takes tens of milliseconds of CPU. Done on the
+request thread, a burst of logins keeps every worker busy and holds up the
+pages everybody else is loading. :func:`hash_password` and
+:func:`check_password` hand the work to a small process pool instead and wait
+for the answer.
+
+The pool has :data:`WORKERS` processes and takes at most :data:`MAX_PENDING`
+jobs at a time. A caller that can't get a place within :data:`QUEUE_TIMEOUT`
+seconds gets :class:`PasswordPoolBusy` (a 503) rather than queueing without
+end. With ``WORKERS = 0`` passwords are hashed on the calling thread.
+"""
+import concurrent.futures
+import multiprocessing
+import os
+import threading
+
+from werkzeug.exceptions import ServiceUnavailable
+from werkzeug.security import check_password_hash, generate_password_hash
+
+#: Number of processes hashing passwords
+WORKERS = min(4, os.cpu_count() or 1)
+
+#: Most hashing jobs running or waiting at once
+MAX_PENDING = 8 * max(WORKERS, 1)
+
+#: Seconds a caller waits for a place in the queue
+QUEUE_TIMEOUT = 5
+
+_lock = threading.Lock()
+_pool = None
+_slots = threading.BoundedSemaphore(MAX_PENDING)
+
+
+class PasswordPoolBusy(ServiceUnavailable):
+    description = 'Too many people are logging in right now. Please try again in a moment.'
+
+
+def _executor():
+    global _pool
+    with _lock:
+        if _pool is None:
+            # spawn, because forking a process with request threads running
+            # can copy a lock some other thread holds
+            _pool = concurrent.futures.ProcessPoolExecutor(
+                max_workers=WORKERS, mp_context=multiprocessing.get_context('spawn'))
+        return _pool
+
+
+def _run(function, *args):
+    if WORKERS == 0:
+        return function(*args)
+    if not _slots.acquire(timeout=QUEUE_TIMEOUT):
+        raise PasswordPoolBusy()
+    try:
+        pool = _executor()
+        try:
+            return pool.submit(function, *args).result()
+        except concurrent.futures.process.BrokenProcessPool:
+            # a worker died; start a new pool next time and do this one here
+            global _pool
+            with _lock:
+                if _pool is pool:
+                    _pool = None
+            return function(*args)
+    finally:
+        _slots.release()
+
+
+def hash_password(password):
+    """Return the salted hash of ``password`` to store."""
+    return _run(generate_password_hash, password)
+
+
+def check_password(pwhash, password):
+    """Whether ``password`` matches the stored hash ``pwhash``."""
+    return _run(check_password_hash, pwhash, password)
+
+
+def shutdown():
+    """Stop the worker processes (a new pool starts on the next call)."""
+    global _pool
+    with _lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown()
@@ -1,6 +1,46 @@
+import heapq
+import itertools
 import time
 import tinydb
 
+from .helpers import transaction
+from .indexes import SortedIndex, get_index
+
+#: Number of posts shown on one page of a feed
+PAGE_SIZE = 20
+
+def _author_index(posts):
+    return get_index(posts, 'author', lambda: SortedIndex(
+        lambda post: post.get('user'), lambda post: post.get('time')))
+
+def _recent_index(posts):
+    return get_index(posts, 'recent', lambda: SortedIndex(
+        lambda post: 'all', lambda post: post.get('time')))
+
+def _older_than(before):
+    """Filter for the plain TinyDB fallbacks, matching the index cursors."""
+    def test(post):
+        return before is None or (post.get('time'), post.doc_id) < tuple(before)
+    return test
+
+def make_cursor(post):
+    """Return the pagination cursor pointing just past ``post``."""
+    return '{!r},{}'.format(post['time'], post.doc_id)
+
+def parse_cursor(text):
+    """Parse a ``<timestamp>,<doc_id>`` cursor, or return None if malformed."""
+    try:
+        timestamp, doc_id = (text or '').split(',')
+        return float(timestamp), int(doc_id)
+    except ValueError:
+        return None
+
+def next_cursor(page, limit=PAGE_SIZE):
+    """Return the cursor for the page after ``page``, or None if it was the last."""
+    if len(page) < limit:
+        return None
+    return make_cursor(page[-1])
+
 def add_post(db, user, text, image_path=None):
     """Add a post with optional image"""
     posts = db.table('posts')
@@ -13,9 +53,49 @@ def add_post(db, user, text, image_path=None):
     return posts.insert(post_data)
 
 def get_posts(db, user):
+    """Get all posts by a user, oldest first"""
+    posts = db.table('posts')
+    index = _author_index(posts)
+    if index is None:
+        Post = tinydb.Query()
+        return posts.search(Post.user==user['username'])
+    with transaction(db):
+        return [posts.get(doc_id=doc_id)
+                for _, doc_id in index.oldest(user['username'])]
+
+def get_timeline(db, usernames, limit=PAGE_SIZE, before=None):
+    """Get the newest ``limit`` posts written by any of ``usernames``.
+
+    The per-author post lists are merged newest-first with a heap, so only
+    about ``limit`` posts are looked at no matter how long the history is.
+    Pass the ``before`` cursor of the previous page to get the next one.
+    """
+    posts = db.table('posts')
+    index = _author_index(posts)
+    if index is None:
+        Post = tinydb.Query()
+        found = filter(_older_than(before), posts.search(Post.user.one_of(list(usernames))))
+        return sorted(found, key=lambda post: (post['time'], post.doc_id), reverse=True)[:limit]
+    with transaction(db):
+        merged = heapq.merge(*(index.newest(name, before) for name in set(usernames)),
+                             reverse=True)
+        return [posts.get(doc_id=doc_id)
+                for _, doc_id in itertools.islice(merged, limit)]
+
+def get_user_posts(db, username, limit=PAGE_SIZE, before=None):
+    """Get one page of a user's posts, newest first"""
+    return get_timeline(db, [username], limit, before)
+
+def get_recent_posts(db, limit=PAGE_SIZE, before=None):
+    """Get one page of everybody's posts, newest first"""
     posts = db.table('posts')
-    Post = tinydb.Query()
-    return posts.search(Post.user==user['username'])
+    index = _recent_index(posts)
+    if index is None:
+        found = filter(_older_than(before), posts.all())
+        return sorted(found, key=lambda post: (post['time'], post.doc_id), reverse=True)[:limit]
+    with transaction(db):
+        return [posts.get(doc_id=doc_id)
+                for _, doc_id in itertools.islice(index.newest('all', before), limit)]
 
 def get_all_posts(db):
     """Get all posts from the database"""
@@ -0,0 +1,49 @@
+import queue
+import threading
+
+
+class Broker:
+    """A single-process publish/subscribe fan-out.
+
+    Every subscriber of a key gets its own bounded queue, and publishing puts
+    the message on each of them. A subscriber that falls too far behind
+    misses messages rather than blocking the publisher; stream clients can
+    catch up from the database when they reconnect.
+    """
+
+    #: Messages a subscriber can fall behind before new ones are dropped
+    QUEUE_SIZE = 100
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = {}
+
+    def subscribe(self, key):
+        """Start receiving messages published under ``key``."""
+        subscription = queue.Queue(self.QUEUE_SIZE)
+        with self._lock:
+            self._subscribers.setdefault(key, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, key, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(key)
+            if subscribers is None:
+                return
+            subscribers.discard(subscription)
+            if not subscribers:
+                del self._subscribers[key]
+
+    def publish(self, key, message):
+        """Hand ``message`` to everybody subscribed to ``key``."""
+        with self._lock:
+            subscribers = list(self._subscribers.get(key, ()))
+        for subscription in subscribers:
+            try:
+                subscription.put_nowait(message)
+            except queue.Full:
+                pass
+
+
+#: The broker shared by the whole app
+broker = Broker()
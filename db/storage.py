@@ -0,0 +1,255 @@
+import contextlib
+import json
+import os
+import threading
+
+from tinydb import Storage
+from tinydb.middlewares import CachingMiddleware
+from tinydb.storages import touch
+
+
+class LogStorage(Storage):
+    """An append-only storage for TinyDB.
+
+    The database lives in two files: a JSON snapshot (``db.json``, in the same
+    format ``JSONStorage`` uses) and a log next to it (``db.json.log``) holding
+    one compact record per changed document. Writing a change only appends
+    its record to the log. On startup the snapshot is loaded and the log
+    replayed on top of it.
+
+    Once the log grows past ``COMPACT_SIZE`` bytes it is sealed and a
+    background thread folds it into a fresh snapshot, while new records keep
+    going to a new log.
+
+    Log records are JSON arrays:
+
+    - ``["set", table, doc_id, document]``
+    - ``["del", table, doc_id]``
+    - ``["clear", table]``
+    - ``["drop", table]`` (``table`` is ``null`` to drop every table)
+    """
+
+    #: Size in bytes at which the log gets folded into the snapshot
+    COMPACT_SIZE = 4 * 1024 * 1024
+
+    def __init__(self, path, create_dirs=False, encoding=None, **kwargs):
+        super().__init__()
+        self._path = path
+        self._log_path = path + '.log'
+        self._sealed_path = path + '.log.1'
+        self._encoding = encoding
+        self.kwargs = kwargs
+
+        touch(path, create_dirs=create_dirs)
+        # a sealed log left by a crash mid-compaction has to be folded in
+        # before a new seal can replace it
+        if os.path.exists(self._sealed_path):
+            self._compact()
+        self._log = open(self._log_path, 'a', encoding=encoding)
+        self._compactor = None
+
+    def read(self):
+        data = self._read_snapshot()
+        for path in (self._sealed_path, self._log_path):
+            data = self._replay(data, path)
+        return data
+
+    def write(self, data):
+        """Replace everything with a full snapshot of ``data``."""
+        self._wait_for_compaction()
+        self._write_snapshot(data)
+        self._log.truncate(0)
+        if os.path.exists(self._sealed_path):
+            os.remove(self._sealed_path)
+
+    def append(self, records):
+        """Append already-serialized log records to the log."""
+        self._log.write(''.join(records))
+        self._log.flush()
+        os.fsync(self._log.fileno())
+
+        if self._log.tell() >= self.COMPACT_SIZE and not self._compacting():
+            self._seal()
+            self._compactor = threading.Thread(target=self._compact,
+                                               name='db-compact', daemon=True)
+            self._compactor.start()
+
+    def close(self):
+        self._wait_for_compaction()
+        self._log.close()
+
+    @staticmethod
+    def encode(op, table, doc_id=None, doc=None):
+        """Serialize a single log record."""
+        if op == 'set':
+            record = [op, table, str(doc_id), doc]
+        elif op == 'del':
+            record = [op, table, str(doc_id)]
+        else:
+            record = [op, table]
+        return json.dumps(record, separators=(',', ':')) + '\n'
+
+    def _read_snapshot(self):
+        with open(self._path, encoding=self._encoding) as f:
+            text = f.read()
+        return json.loads(text) if text else None
+
+    def _write_snapshot(self, data):
+        tmp_path = self._path + '.tmp'
+        with open(tmp_path, 'w', encoding=self._encoding) as f:
+            f.write(json.dumps(data, **self.kwargs))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self._path)
+
+    def _replay(self, data, path):
+        if not os.path.exists(path):
+            return data
+        with open(path, encoding=self._encoding) as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # a torn final record from a crash mid-append
+                    break
+                data = self._apply(data, record)
+        return data
+
+    @staticmethod
+    def _apply(data, record):
+        if data is None:
+            data = {}
+        op, table = record[0], record[1]
+        if op == 'set':
+            data.setdefault(table, {})[record[2]] = record[3]
+        elif op == 'del':
+            data.get(table, {}).pop(record[2], None)
+        elif op == 'clear':
+            data[table] = {}
+        elif op == 'drop':
+            if table is None:
+                data.clear()
+            else:
+                data.pop(table, None)
+        return data
+
+    def _seal(self):
+        if os.path.exists(self._sealed_path):
+            # the last compaction failed; don't overwrite what it left
+            self._compact()
+        self._log.close()
+        os.replace(self._log_path, self._sealed_path)
+        self._log = open(self._log_path, 'a', encoding=self._encoding)
+
+    def _compact(self):
+        # Records are whole-document sets and deletes, so replaying the
+        # sealed log twice (if we crash before removing it) is harmless.
+        data = self._replay(self._read_snapshot(), self._sealed_path)
+        self._write_snapshot(data or {})
+        os.remove(self._sealed_path)
+
+    def _compacting(self):
+        return self._compactor is not None and self._compactor.is_alive()
+
+    def _wait_for_compaction(self):
+        if self._compactor is not None:
+            self._compactor.join()
+            self._compactor = None
+
+
+class BatchingMiddleware(CachingMiddleware):
+    """A thread-safe caching middleware that coalesces writes.
+
+    The parsed database stays in memory and every read is served from it.
+    Writes only mark the cache dirty; they reach the underlying storage once
+    ``WRITE_CACHE_SIZE`` writes have piled up, or every ``FLUSH_INTERVAL``
+    seconds by a background thread, whichever comes first.
+
+    If the storage supports appending (see :class:`LogStorage`), tables report
+    each changed document through :meth:`record` and a flush only appends
+    those records. Writes made outside of :meth:`tracked` can't be described
+    that way, so they fall back to a full snapshot.
+    """
+
+    #: Number of writes to coalesce before flushing to disk
+    WRITE_CACHE_SIZE = 100
+
+    #: Seconds between background flushes of a dirty cache
+    FLUSH_INTERVAL = 1.0
+
+    def __init__(self, storage_cls):
+        super().__init__(storage_cls)
+        self.lock = threading.RLock()
+        self._stopped = threading.Event()
+        self._flusher = None
+        self._appendable = False
+        self._records = []
+        self._tracking = 0
+        self._untracked = False
+
+    def __call__(self, *args, **kwargs):
+        super().__call__(*args, **kwargs)
+        self._appendable = hasattr(self.storage, 'append')
+        self._flusher = threading.Thread(target=self._flush_periodically,
+                                         name='db-flush', daemon=True)
+        self._flusher.start()
+        return self
+
+    def _flush_periodically(self):
+        while not self._stopped.wait(self.FLUSH_INTERVAL):
+            self.flush()
+
+    @contextlib.contextmanager
+    def tracked(self):
+        """Mark writes made inside the block as described by records.
+
+        A full batch is only flushed once the outermost block ends, so the
+        records of its writes are queued by then.
+        """
+        with self.lock:
+            self._tracking += 1
+            try:
+                yield
+            finally:
+                self._tracking -= 1
+                if not self._tracking:
+                    self._flush_if_full()
+
+    def record(self, op, table, doc_id=None, doc=None):
+        """Queue a log record describing a change to the cache."""
+        if self._appendable:
+            with self.lock:
+                self._records.append(self.storage.encode(op, table, doc_id, doc))
+
+    def read(self):
+        with self.lock:
+            return super().read()
+
+    def write(self, data):
+        with self.lock:
+            self.cache = data
+            self._cache_modified_count += 1
+            if not self._tracking:
+                self._untracked = True
+                self._flush_if_full()
+
+    def flush(self):
+        with self.lock:
+            if not self._cache_modified_count and not self._records:
+                return
+            if self._appendable and not self._untracked:
+                self.storage.append(self._records)
+            else:
+                self.storage.write(self.cache)
+            self._records = []
+            self._untracked = False
+            self._cache_modified_count = 0
+
+    def _flush_if_full(self):
+        if self._cache_modified_count >= self.WRITE_CACHE_SIZE:
+            self.flush()
+
+    def close(self):
+        self._stopped.set()
+        with self.lock:
+            super().close()
@@ -0,0 +1,74 @@
+"""Recently used user documents, for resolving the logged-in user.
+
+Almost every request starts by looking up the document of the user who made
+it. :class:`UserCache` keeps the most recently used ones. It is kept on the
+users table as an index (see :mod:`db.indexes`), so any change to a user
+drops their entry. Entries also expire after :data:`TTL` seconds, and at
+most :data:`MAX_USERS` are kept (the least recently used go first).
+
+Cached documents are shared by every request that asks for the same user
+and must not be changed. The functions in :mod:`db.users` that change users
+read the current document themselves.
+"""
+import collections
+import copy
+import time
+
+from tinydb.table import Document
+
+#: Seconds a cached user is served for
+TTL = 30
+
+#: Most users cached at once
+MAX_USERS = 1024
+
+
+class UserCache:
+    """User documents by username, least recently used first."""
+
+    def __init__(self, ttl=TTL, max_users=MAX_USERS, clock=time.monotonic):
+        self._ttl = ttl
+        self._max_users = max_users
+        self._clock = clock
+        # username -> (expiry time, document)
+        self._entries = collections.OrderedDict()
+        self._names = {}
+
+    def update(self, doc_id, doc):
+        name = self._names.pop(doc_id, None)
+        if name is not None:
+            self._entries.pop(name, None)
+
+    def clear(self):
+        self._entries.clear()
+        self._names.clear()
+
+    def get(self, username):
+        """The cached document of ``username``, or ``None``."""
+        entry = self._entries.get(username)
+        if entry is None:
+            return None
+        expires, doc = entry
+        if expires <= self._clock():
+            self._forget(username)
+            return None
+        self._entries.move_to_end(username)
+        return doc
+
+    def put(self, doc):
+        """Cache a copy of the user document ``doc`` and return it."""
+        self._forget(doc['username'])
+        doc = Document(copy.deepcopy(dict(doc)), doc.doc_id)
+        self._entries[doc['username']] = (self._clock() + self._ttl, doc)
+        self._names[doc.doc_id] = doc['username']
+        while len(self._entries) > self._max_users:
+            self._forget(next(iter(self._entries)))
+        return doc
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _forget(self, username):
+        entry = self._entries.pop(username, None)
+        if entry is not None and self._names.get(entry[1].doc_id) == username:
+            del self._names[entry[1].doc_id]
@@ -1,14 +1,42 @@
 import tinydb
-from werkzeug.security import generate_password_hash, check_password_hash
-from .db_utils import load_db
+from . import blobs
+from . import friends as friend_db
+from . import likes as like_db
+from . import passwords
+from .helpers import transaction
+from .indexes import HashIndex, SortedIndex, TrigramIndex, get_index, match_rank
+from .usercache import UserCache
+
+#: Number of users on one page of /find-friends results
+PAGE_SIZE = 20
+
+#: Profile flags that /find-friends can filter on
+FLAGS = ('is_clown', 'has_clown_horns')
+
+#: Number of users returned by a username search
+SEARCH_LIMIT = 20
+
+def _username_index(users):
+    return get_index(users, 'username', lambda: HashIndex(lambda doc: doc.get('username')))
+
+def _find_by_name(users, username):
+    """Look up a user document by username through the username index."""
+    index = _username_index(users)
+    if index is None:
+        User = tinydb.Query()
+        return users.get(User.username == username)
+    doc_id = index.first(username)
+    if doc_id is None:
+        return None
+    return users.get(doc_id=doc_id)
 
 def new_user(db, username, password, email= None, shoe_size=None, is_clown=False, has_clown_horns=False):
     users = db.table('users')
-    User = tinydb.Query()
-    if users.get(User.username == username):
+    if _find_by_name(users, username):
         return None
     
-    hashedPassword = generate_password_hash(password)
+    # hashed in the password pool, without holding the database lock
+    hashedPassword = passwords.hash_password(password)
 
     user_record = {
             'username': username,
@@ -23,143 +51,285 @@ def new_user(db, username, password, email= None, shoe_size=None, is_clown=False
             'photos': []
             }
             }
-    return users.insert(user_record)
-def get_all_users():
-    db = load_db() 
-    
-    # 2. FIX: Access the list of users using dictionary key access (db['users'])
-    #         instead of the TinyDB method (db.table('users'))
-    if 'users' in db:
-        all_users = db['users']
-    else:
-        # Handle case where the 'users' key might be missing
-        all_users = [] 
-
-    # 3. If you want to return a list of users, return the list directly
-    return all_users
+    with transaction(db):
+        if _find_by_name(users, username):
+            return None
+        return users.insert(user_record)
+def get_all_users(db):
+    """Get every user from the database"""
+    return db.table('users').all()
 def get_user(db, username, password):
-    db = load_db()
-
-    # 1. FIX: Access the list of users directly from the dictionary
-    users_list = db.get('users', [])
-
-    # 2. FIX: Find the user dictionary using a simple loop (or list comprehension)
-    user = None
-    for u in users_list:
-        if u.get('username') == username:
-            user = u
-            break
-
-    # 3. Check if user was found
-    if not user:
+    """Return the document of ``username`` if ``password`` is theirs, else None."""
+    user = get_user_by_name(db, username)
+    if not user or not user.get('password'):
         return None
-
-    # 4. Check password hash
-    # Ensure the key is 'password' and not 'password_hash' depending on your model
-    # We use .get() here in case the 'password' field is missing
-    hashed_password = user.get('password')
-
-    if hashed_password and check_password_hash(hashed_password, password):
-        # Credentials valid, return the user dictionary
+    if passwords.check_password(user['password'], password):
         return user
-
     return None
-# db/users.py
+def get_usernames(db):
+    """Get the usernames of every user"""
+    users = db.table('users')
+    index = _username_index(users)
+    if index is None:
+        return [user['username'] for user in users]
+    return index.keys()
+
+def get_user_by_name(db, username):
+    users = db.table('users')
+    return _find_by_name(users, username)
 
-# ... (Existing get_all_users function)
-from db.matches import get_swiped_users
+def get_session_user(db, username):
+    """Get the document of the logged-in user ``username``, from the user
+    cache when possible (see db/usercache.py).
 
-def get_unseen_candidates(current_username):
-    """
-    Gets all users, excluding the current user and any users they have already swiped on.
+    The document may be shared with other requests; don't change it.
     """
-    all_users = get_all_users() # Assuming this returns a list of user objects/dicts
-    swiped_users = get_swiped_users(current_username)
-    
-    candidates = []
-    for user in all_users:
-        if user['username'] != current_username and user['username'] not in swiped_users:
-            candidates.append(user)
-    
-    # Optional: Shuffle the candidates list before returning
-    import random
-    random.shuffle(candidates)
-    
-    return candidates
-def get_user_by_name(db, username):
     users = db.table('users')
-    User = tinydb.Query()
-    return users.get(User.username == username)
+    cache = get_index(users, 'sessions', UserCache)
+    if cache is None:
+        return _find_by_name(users, username)
+    with transaction(db):
+        user = cache.get(username)
+        if user is None:
+            user = _find_by_name(users, username)
+            if user is not None:
+                user = cache.put(user)
+        return user
+
+def user_exists(db, username):
+    users = db.table('users')
+    index = _username_index(users)
+    if index is None:
+        return _find_by_name(users, username) is not None
+    return index.first(username) is not None
 
 def delete_user(db, username, password):
     users = db.table('users')
 
     user = get_user(db, username, password)
     if user:
-        return users.remove(doc_ids=[user.doc_id])
+        with transaction(db):
+            # nobody keeps a deleted user as a friend
+            for name in friend_db.followers(db, username):
+                follower = _find_by_name(users, name)
+                users.update({'friends': [f for f in follower['friends'] if f != username]},
+                             doc_ids=[follower.doc_id])
+            removed = users.remove(doc_ids=[user.doc_id])
+        for photo in user.get('profile', {}).get('photos', []):
+            blobs.release(db, photo)
+        like_db.forget_user(db, username)
+        return removed
     return False
 
 def add_user_friend(db, user, friend):
     users = db.table('users')
-    User = tinydb.Query()
-    if friend not in user['friends']:
-        if users.get(User.username == friend):
-            user['friends'].append(friend)
-            users.upsert(user, (User.username == user['username']) &
-                    (User.password == user['password']))
-            return 'Friend {} added successfully!'.format(friend), 'success'
-        return 'User {} does not exist.'.format(friend), 'danger'
-    return 'You are already friends with {}.'.format(friend), 'warning'
+    with transaction(db):
+        if friend_db.is_friend(db, user, friend):
+            return 'You are already friends with {}.'.format(friend), 'warning'
+        if not user_exists(db, friend):
+            return 'User {} does not exist.'.format(friend), 'danger'
+        # the current list, not the caller's copy (which may be cached)
+        friends = users.get(doc_id=user.doc_id)['friends']
+        users.update({'friends': friends + [friend]}, doc_ids=[user.doc_id])
+    return 'Friend {} added successfully!'.format(friend), 'success'
 
 def remove_user_friend(db, user, friend):
     users = db.table('users')
-    User = tinydb.Query()
-    if friend in user['friends']:
-        user['friends'].remove(friend)
-        users.upsert(user, (User.username == user['username']) &
-                (User.password == user['password']))
-        return 'Friend {} successfully unfriended!'.format(friend), 'success'
-    return 'You are not friends with {}.'.format(friend), 'warning'
+    with transaction(db):
+        # the stored list rather than the graph, which has no edge to a
+        # friend whose account is gone
+        friends = users.get(doc_id=user.doc_id)['friends']
+        if friend not in friends:
+            return 'You are not friends with {}.'.format(friend), 'warning'
+        users.update({'friends': [name for name in friends if name != friend]},
+                     doc_ids=[user.doc_id])
+    return 'Friend {} successfully unfriended!'.format(friend), 'success'
+
+def summarize_user(user):
+    """The public summary of a user shown in friend lists"""
+    profile = user.get('profile', {})
+    photos = profile.get('photos') or []
+    return {
+        'username': user['username'],
+        'avatar': photos[0] if photos else None,
+        'bio': profile.get('bio', '')
+    }
+
+def get_users_by_name_list(db, names):
+    """Get the documents of the named users, in the given order. Unknown
+    names are skipped."""
+    users = db.table('users')
+    index = _username_index(users)
+    if index is None:
+        User = tinydb.Query()
+        found = {u['username']: u for u in users.search(User.username.one_of(list(names)))}
+        return [found[name] for name in names if name in found]
+    with transaction(db):
+        found = (_find_by_name(users, name) for name in names)
+        return [user for user in found if user is not None]
+
+def get_users_by_names(db, names):
+    """Get summaries of the named users, in the given order.
+
+    Unknown names are skipped. Passwords and other private fields are left
+    out.
+    """
+    return [summarize_user(user) for user in get_users_by_name_list(db, names)]
 
 def get_user_friends(db, user):
+    """Get summaries of a user's friends"""
+    return get_users_by_names(db, user['friends'])
+
+def _search_index(users):
+    return get_index(users, 'username_search',
+                     lambda: TrigramIndex(lambda doc: doc.get('username')))
+
+def search_users(db, query, limit=SEARCH_LIMIT):
+    """Find users whose username contains ``query``, ignoring case.
+
+    Returns summaries of the best ``limit`` matches, best first (see
+    :func:`db.indexes.match_rank`). Queries shorter than three characters
+    only match the start of usernames.
+    """
     users = db.table('users')
-    User = tinydb.Query()
-    friends = []
-    for friend in user['friends']:
-        friends.append(users.get(User.username == friend))
-    return friends
+    query = query.strip().lower()
+    if not query:
+        return []
+    index = _search_index(users)
+    if index is None:
+        ranked = []
+        for user in users:
+            rank = match_rank(user.get('username', '').lower(), query)
+            if rank is not None and (len(query) >= 3 or rank[1] == 0):
+                ranked.append((rank, user))
+        ranked.sort(key=lambda item: item[0])
+        found = [user for _, user in ranked[:limit]]
+    else:
+        with transaction(db):
+            found = [users.get(doc_id=doc_id) for doc_id in index.search(query, limit)]
+    return [summarize_user(user) for user in found]
+
+def _has_flag(doc, name):
+    return bool(doc.get('profile', {}).get(name))
+
+def _shoe_size(doc):
+    size = doc.get('profile', {}).get('shoe_size')
+    if isinstance(size, bool) or not isinstance(size, (int, float)):
+        return 0
+    return size
+
+def _flag_index(users, name):
+    return get_index(users, name, lambda: HashIndex(lambda doc: _has_flag(doc, name)))
+
+def _shoe_size_index(users):
+    return get_index(users, 'shoe_size', lambda: SortedIndex(lambda doc: 'all', _shoe_size))
+
+def _profile_card(user):
+    """The public profile fields shown in /find-friends results"""
+    profile = user.get('profile', {})
+    return dict(summarize_user(user),
+                is_clown=_has_flag(user, 'is_clown'),
+                has_clown_horns=_has_flag(user, 'has_clown_horns'),
+                shoe_size=profile.get('shoe_size'))
+
+def _scan_users(users, flags, min_shoe_size, exclude):
+    """Filter the users with a full scan, for tables that can't keep indexes."""
+    def matches(doc):
+        return (doc.get('username') != exclude
+                and all(_has_flag(doc, name) for name in flags)
+                and _shoe_size(doc) >= min_shoe_size)
+
+    found = users.search(matches)
+    found.sort(key=lambda doc: (_shoe_size(doc), doc.doc_id), reverse=True)
+    return [doc.doc_id for doc in found]
+
+def _plan_users(users, flags, min_shoe_size, exclude, wanted):
+    """Find the doc ids of up to ``wanted`` matching users through the indexes.
+
+    Each flag filter is a set of doc ids and the shoe size filter a range of
+    the shoe size index. The range is walked from the largest size down,
+    checking the flags per doc id, until enough users matched; if the
+    smallest flag set is cheaper than the walk is expected to be (going by
+    how many users have each flag), that set is filtered and sorted instead.
+    """
+    flag_indexes = [_flag_index(users, name) for name in flags]
+    sizes = _shoe_size_index(users)
+    excluded = _username_index(users).first(exclude) if exclude else None
+
+    def matches(doc_id):
+        return doc_id != excluded and all(index.contains(True, doc_id)
+                                          for index in flag_indexes)
+
+    total = sizes.count('all')
+    walk_cost = sizes.count_at_least('all', min_shoe_size)
+    selectivity = 1.0
+    for index in flag_indexes:
+        selectivity *= index.count(True) / total if total else 0
+    if selectivity:
+        walk_cost = min(walk_cost, wanted / selectivity)
+
+    narrowest = min(flag_indexes, key=lambda index: index.count(True), default=None)
+    if narrowest is not None and narrowest.count(True) < walk_cost:
+        found = [doc_id for doc_id in narrowest.get(True)
+                 if matches(doc_id) and sizes.key_of(doc_id) >= min_shoe_size]
+        found.sort(key=lambda doc_id: (sizes.key_of(doc_id), doc_id), reverse=True)
+        return found[:wanted]
+
+    found = []
+    for size, doc_id in sizes.newest('all'):
+        if size < min_shoe_size or len(found) == wanted:
+            break
+        if matches(doc_id):
+            found.append(doc_id)
+    return found
+
+def find_users(db, exclude=None, is_clown=False, has_clown_horns=False,
+               min_shoe_size=0, offset=0, limit=PAGE_SIZE):
+    """Find users by profile flags and minimum shoe size.
+
+    Users are ordered by shoe size, largest first. Returns a page of at most
+    ``limit`` public profile cards starting at ``offset``, and whether there
+    are more results after it. The user named ``exclude`` is left out.
+    """
+    users = db.table('users')
+    flags = [name for name, wanted in zip(FLAGS, (is_clown, has_clown_horns)) if wanted]
+    with transaction(db):
+        if _username_index(users) is None:
+            doc_ids = _scan_users(users, flags, min_shoe_size, exclude)
+        else:
+            doc_ids = _plan_users(users, flags, min_shoe_size, exclude, offset + limit + 1)
+        page = [users.get(doc_id=doc_id) for doc_id in doc_ids[offset:offset + limit]]
+    return [_profile_card(user) for user in page], len(doc_ids) > offset + limit
 
 def update_user_profile(db, username, bio=None, email=None):
     """Update user's bio and/or email"""
     users = db.table('users')
-    User = tinydb.Query()
-    user = users.get(User.username == username)
+    with transaction(db):
+        user = _find_by_name(users, username)
 
-    if not user:
-        return False
+        if not user:
+            return False
 
-    if bio is not None:
-        user['profile']['bio'] = bio
-    if email is not None:
-        user['email'] = email
+        fields = {}
+        if bio is not None:
+            fields['profile'] = dict(user['profile'], bio=bio)
+        if email is not None:
+            fields['email'] = email
 
-    users.update(user, User.username == username)
+        users.update(fields, doc_ids=[user.doc_id])
     return True
 
 def add_user_photo(db, username, photo_path):
     """Add a photo path to user's profile"""
     users = db.table('users')
-    User = tinydb.Query()
-    user = users.get(User.username == username)
-
-    if not user:
-        return False
+    with transaction(db):
+        user = _find_by_name(users, username)
 
-    if 'photos' not in user['profile']:
-        user['profile']['photos'] = []
+        if not user:
+            return False
 
-    user['profile']['photos'].append(photo_path)
-    users.update(user, User.username == username)
+        photos = list(user['profile'].get('photos') or []) + [photo_path]
+        users.update({'profile': dict(user['profile'], photos=photos)}, doc_ids=[user.doc_id])
     return True
 
 
@@ -0,0 +1,68 @@
+"""Fingerprinted URLs for the static assets.
+
+At startup every file in the static folder (except uploads) is hashed into a
+manifest, and ``url_for('static', filename=...)`` adds the file's hash as a
+``v`` query argument. A request carrying the current hash of its file always
+gets the same bytes, so it is served with a one-year immutable
+Cache-Control and browsers stop revalidating stylesheets and scripts on
+every page view. Changing a file changes its URL. Uploads keep the default
+headers and are revalidated with their ETags.
+"""
+import hashlib
+import os
+
+import flask
+
+#: Static subfolders that aren't fingerprinted
+EXCLUDED = ('uploads',)
+
+#: Cache lifetime of fingerprinted assets, in seconds
+MAX_AGE = 365 * 24 * 60 * 60
+
+_manifest = {}
+
+
+def build_manifest(folder):
+    """Map the path of every asset under ``folder`` (relative, with forward
+    slashes) to a short hash of its contents."""
+    manifest = {}
+    for root, dirs, files in os.walk(folder):
+        if root == folder:
+            dirs[:] = [d for d in dirs if d not in EXCLUDED]
+        for name in files:
+            if name.startswith('.'):
+                continue
+            path = os.path.join(root, name)
+            digest = hashlib.sha256()
+            with open(path, 'rb') as f:
+                for chunk in iter(lambda: f.read(64 * 1024), b''):
+                    digest.update(chunk)
+            manifest[os.path.relpath(path, folder).replace(os.sep, '/')] = digest.hexdigest()[:12]
+    return manifest
+
+
+def load_manifest(folder):
+    global _manifest
+    _manifest = build_manifest(folder)
+
+
+def add_fingerprint(endpoint, values):
+    """A ``url_defaults`` hook adding the asset hash to static URLs."""
+    if endpoint != 'static' or flask.current_app.debug:
+        return
+    digest = _manifest.get(values.get('filename'))
+    if digest is not None:
+        values.setdefault('v', digest)
+
+
+def cache_fingerprinted(response):
+    """An ``after_request`` hook making fingerprinted assets immutable."""
+    request = flask.request
+    if (request.endpoint == 'static' and response.status_code in (200, 304)
+            and request.args.get('v') is not None
+            and request.args.get('v') == _manifest.get(request.view_args.get('filename'))):
+        response.cache_control.no_cache = None
+        response.cache_control.public = True
+        response.cache_control.max_age = MAX_AGE
+        response.cache_control.immutable = True
+    return response
@@ -0,0 +1,110 @@
+"""A cache of rendered post cards.
+
+Posts don't change once they're written, so the HTML of a post card only
+needs rendering the first time it is shown. Templates call
+``post_card(template, post, **state)`` instead of laying the card out inline.
+The rendered card is kept in a least-recently-used cache bounded by its size
+in bytes. The cache key holds everything a card depends on: the template,
+the post's doc id and timestamp (doc ids can be reused after a delete), a
+version (see :func:`post_version`) and any per-viewer ``state`` passed in.
+A change to any of these renders a new card, and the stale one is evicted
+once it stops being used.
+
+The cache is bounded by the app's ``FRAGMENT_CACHE_BYTES`` setting
+(:data:`MAX_BYTES` by default).
+
+Cards must not contain anything tied to a session or a viewer, such as a
+CSRF token or whether the viewer liked the post, or anything that changes
+often, like a like count. Those parts are rendered next to the cached card.
+"""
+import collections
+import sys
+import threading
+
+import flask
+import markupsafe
+
+from handlers import images
+
+#: Default bound on the memory held by cached cards, in bytes
+MAX_BYTES = 8 * 1024 * 1024
+
+
+class FragmentCache:
+    """A least-recently-used map of keys to rendered HTML, bounded by the
+    total size of the HTML."""
+
+    def __init__(self, max_bytes=MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            html = self._entries.get(key)
+            if html is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return html
+
+    def put(self, key, html):
+        cost = sys.getsizeof(html)
+        if cost > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.size -= sys.getsizeof(old)
+            self._entries[key] = html
+            self.size += cost
+            while self.size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.size -= sys.getsizeof(evicted)
+
+    def resize(self, max_bytes):
+        """Change the memory bound, evicting cards as needed."""
+        with self._lock:
+            self.max_bytes = max_bytes
+            while self.size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.size -= sys.getsizeof(evicted)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+
+cache = FragmentCache()
+
+
+def post_version(post):
+    """The parts of a post's card that can change after the post is written.
+
+    Resized variants of a post's image appear once they've been generated,
+    which changes the card's ``srcset``.
+    """
+    return images.srcset(post.get('image'))
+
+
+def post_card(template, post, **state):
+    """The HTML of ``post`` rendered with ``template``, from the cache if
+    possible. ``state`` is passed to the template and is part of the key."""
+    max_bytes = flask.current_app.config.get('FRAGMENT_CACHE_BYTES', MAX_BYTES)
+    if max_bytes != cache.max_bytes:
+        cache.resize(max_bytes)
+    key = (template, post.doc_id, post.get('time'), post_version(post),
+           tuple(sorted(state.items())))
+    html = cache.get(key)
+    if html is None:
+        html = flask.render_template(template, post=post, **state)
+        cache.put(key, html)
+    return markupsafe.Markup(html)
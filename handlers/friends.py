@@ -2,9 +2,14 @@ import flask
 
 from flask import flash, session
 from handlers import copy
-from db import posts, users, helpers
+from db import comments, likes, posts, users, helpers
+from db import friends as friend_db
 
 blueprint = flask.Blueprint("friends", __name__)
+
+#: Number of names suggested while typing in the search box
+SUGGEST_LIMIT = 8
+
 #-------NEW ROUTE FOR FINDING AND FILTERING FRIENDS-------
 @blueprint.route('/find-friends')
 def find_friends():
@@ -15,46 +20,39 @@ def find_friends():
         return flask.redirect(flask.url_for('login.loginscreen'))
 
     username = session['username']
-    all_users = users.get_all_users()
-     # Get the filter criteria from the form submission (from the URL)
+    # Get the filter criteria from the form submission (from the URL)
     min_shoe_size_str = flask.request.args.get('shoe_size')
     is_clown = flask.request.args.get('is_clown')
     has_clown_horns = flask.request.args.get('has_clown_horns')
+    page = flask.request.args.get('page', 1, type=int)
+    page = max(page, 1)
 
     # Convert shoe size to an integer for numerical comparison
     min_shoe_size = 0
     if min_shoe_size_str and min_shoe_size_str.isdigit():
         min_shoe_size = int(min_shoe_size_str)
 
-    # Start with an empty list and add users who match all active filters
-    filtered_users = []
-    for user in all_users:
-        # Don't show the currently logged-in user in the results
-        if user['username'] == username:
-            continue
-
-        # Check "Is a Clown" filter
-        # If the filter is on, but the user is not a clown, skip them.
-        if is_clown and not user.get('is_clown', False):
-            continue
-
-        # Check "Has Clown Horns" filter
-        # If the filter is on, but the user doesn't have horns, skip them.
-        if has_clown_horns and not user.get('has_clown_horns', False):
-            continue
-
-        # Check "Minimum Shoe Size" filter
-        user_shoe_size = user.get('shoe_size')
-        if min_shoe_size > 0:
-            # If shoe size filter is active, skip users with no shoe size or a size that's too small.
-            if user_shoe_size is None or user_shoe_size < min_shoe_size:
-                continue
-
-        # If the user has passed all the "continue" checks, they are a match.
-        filtered_users.append(user)
+    # The users table keeps indexes on these filters, so only the
+    # matching users for this page are ever looked at
+    found, has_more = users.find_users(db, exclude=username,
+            is_clown=bool(is_clown), has_clown_horns=bool(has_clown_horns),
+            min_shoe_size=min_shoe_size, offset=(page - 1) * users.PAGE_SIZE)
+    mutual = friend_db.mutual_friend_counts(db, username, [u['username'] for u in found])
+    for found_user in found:
+        found_user['mutual_friends'] = mutual[found_user['username']]
+    suggestions = friend_db.suggest_friends(db, username) if page == 1 else []
+
+    args = flask.request.args.to_dict()
+    args.pop('csrf_token', None)
+    args.pop('page', None)
+    prev_url = (flask.url_for('friends.find_friends', page=page - 1, **args)
+                if page > 1 else None)
+    next_url = (flask.url_for('friends.find_friends', page=page + 1, **args)
+                if has_more else None)
 
     # Render the new find_friends.html template with the final list
-    return flask.render_template('find_friends.html', users=filtered_users)
+    return flask.render_template('find_friends.html', users=found,
+            suggestions=suggestions, prev_url=prev_url, next_url=next_url)
 
 
 @blueprint.route('/addfriend', methods=['POST'])
@@ -68,7 +66,7 @@ def addfriend():
         return flask.redirect(flask.url_for('login.loginscreen'))
 
     username = session['username']
-    user = users.get_user_by_name(db, username)
+    user = flask.g.user
     if not user:
         flash('Invalid session. Please log in again.', 'danger')
         session.clear()
@@ -92,7 +90,7 @@ def searchUser():
         return flask.redirect(flask.url_for('login.loginscreen'))
 
     username = session['username']
-    user = users.get_user_by_name(db, username)
+    user = flask.g.user
     if not user:
         flask.flash('Invalid session. Please log in again.', 'danger')
         session.clear()
@@ -104,14 +102,13 @@ def searchUser():
         flask.flash('Please enter a username to search for.', 'warning')
         return flask.redirect(flask.url_for('login.index'))
 
-    # case-insensitive substring search across all users
-    all_users = db.table('users').all()
-    q_lower = query.lower()
-    results = [u for u in all_users if u.get('username') and q_lower in u['username'].lower()]
+    # case-insensitive substring search, answered by the username search index
+    results = users.search_users(db, query)
 
     # prepare the same context the feed expects
     user_friends = users.get_user_friends(db, user)
-    user_posts = posts.get_posts(db, user)[::-1]
+    user_posts = posts.get_user_posts(db, username)
+    post_ids = [post.doc_id for post in user_posts]
 
     # <-- RENDER feed.html and include search_results -->
     return flask.render_template(
@@ -122,9 +119,27 @@ def searchUser():
         username=username,
         friends=user_friends,
         posts=user_posts,
+        likes=likes.like_states(db, post_ids, username),
+        comment_previews=comments.comment_previews(db, post_ids),
+        next_cursor=posts.next_cursor(user_posts),
+        more_url=flask.url_for('posts.more_posts', scope='user', user=username),
         search_results=results
     )
 
+@blueprint.route('/searchUser/suggest')
+def suggest_users():
+    """Username suggestions for the search box, as JSON."""
+    if 'username' not in session:
+        return flask.jsonify({'status': 'error', 'message': 'Please log in first.'}), 401
+
+    db = helpers.load_db()
+    query = flask.request.args.get('q', '')
+    limit = min(flask.request.args.get('limit', SUGGEST_LIMIT, type=int), users.SEARCH_LIMIT)
+    return flask.jsonify({
+        'status': 'success',
+        'users': users.search_users(db, query, limit=max(limit, 0))
+    })
+
 @blueprint.route('/unfriend', methods=['POST'])
 def unfriend():
     """Removes a user from the user's friends list."""
@@ -135,7 +150,7 @@ def unfriend():
         return flask.redirect(flask.url_for('login.loginscreen'))
 
     username = session['username']
-    user = users.get_user_by_name(db, username)
+    user = flask.g.user
     if not user:
         flask.flash('Invalid session. Please log in again.', 'danger')
         session.clear()
@@ -157,16 +172,19 @@ def view_friend(fname):
         return flask.redirect(flask.url_for('login.loginscreen'))
 
     username = session['username']
-    user = users.get_user_by_name(db, username)
+    user = flask.g.user
     if not user:
         flask.flash('Invalid session. Please log in again.', 'danger')
         session.clear()
         return flask.redirect(flask.url_for('login.loginscreen'))
 
     friend = users.get_user_by_name(db, fname)
-    all_posts = posts.get_posts(db, friend)[::-1] # reverse order
+    friend_posts = posts.get_user_posts(db, friend['username'])
 
     return flask.render_template('friend.html', title=copy.title,
             subtitle=copy.subtitle, user=user, username=username,
             friend=friend['username'],
-            friends=users.get_user_friends(db, user), posts=all_posts)
+            friends=users.get_user_friends(db, user), posts=friend_posts,
+            next_cursor=posts.next_cursor(friend_posts),
+            more_url=flask.url_for('posts.more_posts', scope='user',
+                                   user=friend['username'], cards='friend'))
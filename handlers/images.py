@@ -0,0 +1,141 @@
+"""Resized variants of uploaded images.
+
+After an upload is saved, a small thread pool writes width-bounded copies of
+it next to the original (``photo.jpg`` gets ``photo.thumb.jpg``,
+``photo.feed.jpg`` and ``photo.full.jpg``) so pages can ask for the size they
+need. The ``thumb`` variant is always written and marks the image as done;
+larger variants are only written when the original is wider than they are.
+
+Pillow is optional. Without it, and for GIFs (which would lose their
+animation), only the original is served.
+"""
+import concurrent.futures
+import logging
+import os
+import threading
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:
+    Image = ImageOps = None
+
+logger = logging.getLogger(__name__)
+
+#: Variant name -> maximum width in pixels, smallest first
+VARIANTS = {'thumb': 160, 'feed': 640, 'full': 1280}
+
+#: Number of threads resizing images in the background
+WORKERS = 2
+
+#: Number of images whose finished variants are remembered
+MAX_CACHED = 10_000
+
+#: URL prefix of the files uploads are saved under
+UPLOAD_URL = '/static/uploads/'
+
+_executor = concurrent.futures.ThreadPoolExecutor(max_workers=WORKERS,
+                                                  thread_name_prefix='image-variants')
+_lock = threading.Lock()
+_pending = set()
+_known = {}
+
+
+def variant_path(path, name):
+    """The path (or URL) of the ``name`` variant of the image at ``path``."""
+    stem, ext = os.path.splitext(path)
+    return '{}.{}{}'.format(stem, name, ext)
+
+
+def make_variants(path):
+    """Write the variants of the image at ``path`` next to it.
+
+    Returns the names of the variants written.
+    """
+    written = []
+    with Image.open(path) as original:
+        if original.format == 'GIF':
+            return written
+        image_format = original.format
+        # the variants are saved without EXIF, so apply its orientation
+        image = ImageOps.exif_transpose(original)
+        for name, width in VARIANTS.items():
+            if written and image.width <= width:
+                break
+            resized = image.copy()
+            resized.thumbnail((width, image.height))
+            target = variant_path(path, name)
+            tmp_path = target + '.tmp'
+            options = {'quality': 85} if image_format == 'JPEG' else {}
+            resized.save(tmp_path, format=image_format, optimize=True, **options)
+            os.replace(tmp_path, target)
+            written.append(name)
+    return written
+
+
+def schedule_variants(path):
+    """Generate the variants of the image saved at ``path`` in the background.
+
+    Returns the future of the job, or ``None`` if Pillow isn't installed.
+    """
+    if Image is None:
+        return None
+    with _lock:
+        _pending.add(path)
+        _known.pop(path, None)
+    return _executor.submit(_generate, path)
+
+
+def _generate(path):
+    try:
+        make_variants(path)
+    except Exception:
+        logger.exception('Could not resize %s', path)
+    finally:
+        with _lock:
+            _pending.discard(path)
+
+
+def _variants(url):
+    """The names of the finished variants of the upload at ``url``."""
+    if not url or not url.startswith(UPLOAD_URL):
+        return ()
+    path = url.lstrip('/')
+    with _lock:
+        if path in _pending:
+            return ()
+        found = _known.get(path)
+    if found is None:
+        found = tuple(name for name in VARIANTS
+                      if os.path.exists(variant_path(path, name)))
+        with _lock:
+            if len(_known) >= MAX_CACHED:
+                _known.clear()
+            _known[path] = found
+    return found
+
+
+def variant_url(url, name):
+    """The URL of the ``name`` variant of an upload, or of the original if
+    that variant doesn't exist."""
+    if name in _variants(url):
+        return variant_path(url, name)
+    return url
+
+
+def srcset(url):
+    """A ``srcset`` attribute value listing the variants of an upload.
+
+    A variant that wasn't written because the original is narrower is
+    stood in for by the original. Empty until the variants are ready.
+    """
+    found = _variants(url)
+    if not found:
+        return ''
+    candidates = []
+    for name, width in VARIANTS.items():
+        if name in found:
+            candidates.append('{} {}w'.format(variant_path(url, name), width))
+        else:
+            candidates.append('{} {}w'.format(url, width))
+            break
+    return ', '.join(candidates)
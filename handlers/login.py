@@ -2,19 +2,28 @@ import flask
 
 from flask import Blueprint,request,redirect,url_for,flash,make_response, session
 from handlers import copy
-from db import posts, users, helpers
+from db import comments, likes, posts, users, helpers
 
 blueprint = flask.Blueprint("login", __name__)
 
+def load_user():
+    """Look up the logged-in user once per request, into ``flask.g.user``.
+
+    ``g.user`` is ``None`` when nobody is logged in or their user is gone.
+    The document may be shared with other requests (see db/usercache.py),
+    so handlers must not change it.
+    """
+    flask.g.user = None
+    username = session.get('username')
+    if username is not None and flask.request.endpoint != 'static':
+        flask.g.user = users.get_session_user(helpers.load_db(), username)
+
 @blueprint.route('/loginscreen')
 def loginscreen():
     """Present a form to the user to enter their username and password."""
-    db = helpers.load_db()
-
     # First check if already logged in
     if 'username' in session:
-        username = session['username']
-        if users.get_user_by_name(db, username):
+        if flask.g.user:
             flask.flash('You are already logged in.', 'warning')
             return flask.redirect(flask.url_for('login.index'))
 
@@ -75,6 +84,12 @@ def login():
     flash(f'Logged in as {username}', 'success')
     return redirect(url_for('login.index')) 
 
+def busy(error):
+    """Send the user back to the login form when passwords can't be checked
+    right now (see db/passwords.py)."""
+    flask.flash(error.description, 'warning')
+    return flask.redirect(flask.url_for('login.loginscreen'))
+
 @blueprint.route('/logout', methods=['POST'])
 def logout():
     """Log out the user."""
@@ -93,7 +108,7 @@ def index():
         return flask.redirect(flask.url_for('login.loginscreen'))
 
     username = session['username']
-    user = users.get_user_by_name(db, username)
+    user = flask.g.user
     if not user:
         flask.flash('Invalid session. Please log in again.', 'danger')
         session.clear()
@@ -101,12 +116,14 @@ def index():
     
     # get the info for the user's feed
     friends = users.get_user_friends(db, user)
-    all_posts = []
-    for friend in friends + [user]:
-        all_posts += posts.get_posts(db, friend)
-    # sort posts
-    sorted_posts = sorted(all_posts, key=lambda post: post['time'], reverse=True)
+    # newest posts from the user and their friends
+    feed_posts = posts.get_timeline(db, user['friends'] + [username])
+    post_ids = [post.doc_id for post in feed_posts]
 
     return flask.render_template('feed.html', title=copy.title,
             subtitle=copy.subtitle, user=user, username=username,
-            friends=friends, posts=sorted_posts)
+            friends=friends, posts=feed_posts,
+            likes=likes.like_states(db, post_ids, username),
+            comment_previews=comments.comment_previews(db, post_ids),
+            next_cursor=posts.next_cursor(feed_posts),
+            more_url=flask.url_for('posts.more_posts', scope='feed'))
@@ -1,15 +1,21 @@
-import flask
+import json
+import queue
 import time
-from db import helpers
-from tinydb import Query
+
+import flask
+from db import helpers, messages, pubsub
 
 blueprint = flask.Blueprint("messages", __name__)
 
+# Seconds between keep-alive comments on an idle stream
+HEARTBEAT_INTERVAL = 15
+
+# Seconds before a stream is closed; the browser reconnects by itself
+STREAM_LIFETIME = 300
+
 @blueprint.route('/message/<username>', methods=['GET', 'POST'])
 def message_user(username):
     db = helpers.load_db()
-    Messages = db.table('messages')
-    User = Query()
 
     # must be logged in
     if "username" not in flask.session:
@@ -20,33 +26,89 @@ def message_user(username):
 
     # POST: sending a message
     if flask.request.method == 'POST':
-        text = flask.request.form.get('message_text').strip()
+        text = flask.request.form.get('message_text', '').strip()
 
         if text == "":
             flask.flash("Message cannot be empty.", "warning")
         else:
-            Messages.insert({
-                "sender": me,
-                "receiver": username,
-                "text": text,
-                "timestamp": time.time()
-            })
+            messages.add_message(db, me, username, text)
             flask.flash("Message sent!", "success")
 
         return flask.redirect(f"/message/{username}")
 
-    # GET: load conversation
-    conversation = Messages.search(
-        ((User.sender == me) & (User.receiver == username)) |
-        ((User.sender == username) & (User.receiver == me))
-    )
-
-    # Sort by timestamp
-    conversation = sorted(conversation, key=lambda x: x["timestamp"])
+    # GET: load conversation, oldest first
+    conversation = messages.get_conversation(db, me, username)
 
     return flask.render_template(
         "messages.html",
         username=me,
         friend=username,
-        messages=conversation
+        messages=conversation,
+        latest=conversation[-1]["timestamp"] if conversation else 0
     )
+
+@blueprint.route('/message/<username>/new')
+def new_messages(username):
+    """Returns the messages of a conversation sent after ``since`` as JSON."""
+    db = helpers.load_db()
+
+    if "username" not in flask.session:
+        return flask.jsonify({"status": "error", "message": "You must be logged in."}), 401
+
+    me = flask.session["username"]
+    since = flask.request.args.get('since', 0, type=float)
+    found = messages.get_conversation(db, me, username, since=since)
+
+    return flask.jsonify({
+        "status": "success",
+        "messages": [dict(m, id=m.doc_id) for m in found],
+        "latest": found[-1]["timestamp"] if found else since
+    })
+
+@blueprint.route('/message/<username>/stream')
+def stream_messages(username):
+    """Pushes new messages of a conversation as Server-Sent Events.
+
+    Each event carries one message as JSON, with its timestamp as the event
+    id, so a reconnecting browser resumes from ``Last-Event-ID``.
+    """
+    db = helpers.load_db()
+
+    if "username" not in flask.session:
+        return flask.jsonify({"status": "error", "message": "You must be logged in."}), 401
+
+    me = flask.session["username"]
+    key = messages.conversation_key(me, username)
+    try:
+        since = float(flask.request.headers.get('Last-Event-ID', ''))
+    except ValueError:
+        since = flask.request.args.get('since', 0, type=float)
+
+    def event(message):
+        return 'id: {!r}\ndata: {}\n\n'.format(message['timestamp'], json.dumps(message))
+
+    def events():
+        # subscribe before catching up so nothing sent in between is lost
+        subscription = pubsub.broker.subscribe(key)
+        try:
+            latest = since
+            for message in messages.get_conversation(db, me, username, since=since):
+                latest = message['timestamp']
+                yield event(dict(message, id=message.doc_id))
+
+            deadline = time.monotonic() + STREAM_LIFETIME
+            while time.monotonic() < deadline:
+                try:
+                    message = subscription.get(timeout=HEARTBEAT_INTERVAL)
+                except queue.Empty:
+                    yield ': keep-alive\n\n'
+                    continue
+                if message['timestamp'] > latest:
+                    latest = message['timestamp']
+                    yield event(message)
+        finally:
+            pubsub.broker.unsubscribe(key, subscription)
+
+    return flask.Response(flask.stream_with_context(events()),
+            mimetype='text/event-stream',
+            headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
@@ -1,16 +1,10 @@
-import os
 import flask
 from flask import session
-from werkzeug.utils import secure_filename
-from db import posts, users, helpers
+from db import comments, likes, posts, users, helpers
+from handlers import uploads
 
 blueprint = flask.Blueprint("posts", __name__)
 
-ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif'}
-
-def allowed_file(filename):
-    return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
-
 @blueprint.route('/post', methods=['POST'])
 def post():
     """Creates a new post with optional image."""
@@ -21,7 +15,7 @@ def post():
         return flask.redirect(flask.url_for('login.loginscreen'))
 
     username = session['username']
-    user = users.get_user_by_name(db, username)
+    user = flask.g.user
     if not user:
         flask.flash('Invalid session. Please log in again.', 'danger')
         session.clear()
@@ -30,25 +24,9 @@ def post():
     # Get caption from form
     caption = flask.request.form.get('caption', '').strip()
 
-    # Handle image upload
-    image_path = None
-    if 'image' in flask.request.files:
-        file = flask.request.files['image']
-        if file and file.filename and allowed_file(file.filename):
-            filename = secure_filename(file.filename)
-            # Create upload directory for posts
-            upload_folder = os.path.join("static/uploads/posts", username)
-            os.makedirs(upload_folder, exist_ok=True)
-
-            # Add timestamp to filename to avoid conflicts
-            import time
-            timestamp = str(int(time.time()))
-            name, ext = os.path.splitext(filename)
-            filename = f"{name}_{timestamp}{ext}"
-
-            filepath = os.path.join(upload_folder, filename)
-            file.save(filepath)
-            image_path = f"/static/uploads/posts/{username}/{filename}"
+    # Handle image upload; it was streamed into the blob store's temporary
+    # area and checked while the request was parsed (see handlers/uploads.py)
+    image_path = uploads.save_image(db, flask.request.files.get('image'))
 
     # Require either caption or image
     if not caption and not image_path:
@@ -61,8 +39,128 @@ def post():
 
     return flask.redirect(flask.url_for('login.index'))
 
+@blueprint.route('/posts/more')
+def more_posts():
+    """Returns the page of posts after the ``before`` cursor.
+
+    ``scope`` picks the posts: ``feed`` (the user and their friends), ``user``
+    (the posts of ``user``) or ``all``. The page comes back as post cards to
+    append to the page, with the next cursor in the ``X-Next-Cursor`` header,
+    or as JSON when ``format=json`` is given.
+    """
+    db = helpers.load_db()
+
+    if 'username' not in session:
+        return flask.jsonify({'status': 'error', 'message': 'Please log in first.'}), 401
+
+    username = session['username']
+    scope = flask.request.args.get('scope', 'feed')
+    before = posts.parse_cursor(flask.request.args.get('before'))
+    if flask.request.args.get('before') and before is None:
+        # serving the first page again would repeat posts already shown
+        return flask.jsonify({'status': 'error', 'message': 'Invalid cursor.'}), 400
+
+    if scope == 'feed':
+        user = flask.g.user
+        if not user:
+            return flask.jsonify({'status': 'error', 'message': 'Invalid session.'}), 401
+        page = posts.get_timeline(db, user['friends'] + [username], before=before)
+    elif scope == 'user':
+        page = posts.get_user_posts(db, flask.request.args.get('user', ''), before=before)
+    elif scope == 'all':
+        page = posts.get_recent_posts(db, before=before)
+    else:
+        return flask.jsonify({'status': 'error', 'message': 'Unknown scope.'}), 400
+
+    cursor = posts.next_cursor(page)
+
+    if flask.request.args.get('format') == 'json':
+        return flask.jsonify({
+            'posts': [dict(post, id=post.doc_id) for post in page],
+            'next': cursor
+        })
+
+    template = 'friend_post_cards.html' if flask.request.args.get('cards') == 'friend' else 'post_cards.html'
+    post_ids = [post.doc_id for post in page]
+    response = flask.make_response(flask.render_template(template, posts=page,
+            likes=likes.like_states(db, post_ids, username),
+            comment_previews=comments.comment_previews(db, post_ids)))
+    response.headers['X-Next-Cursor'] = cursor or ''
+    return response
+
+@blueprint.route('/like/<int:post_id>', methods=['POST'])
+def like(post_id):
+    """Likes a post; answers with its like count so the page can update in place."""
+    return _set_liked(post_id, True)
+
+@blueprint.route('/unlike/<int:post_id>', methods=['POST'])
+def unlike(post_id):
+    """Takes back a like; answers like :func:`like`."""
+    return _set_liked(post_id, False)
+
+def _set_liked(post_id, liked):
+    db = helpers.load_db()
+
+    if 'username' not in session:
+        return flask.jsonify({'status': 'error', 'message': 'Please log in first.'}), 401
+
+    action = likes.like_post if liked else likes.unlike_post
+    count = action(db, post_id, session['username'])
+    if count is None:
+        return flask.jsonify({'status': 'error', 'message': 'No such post.'}), 404
+
+    return flask.jsonify({'status': 'success', 'liked': liked, 'likes': count})
+
 @blueprint.route('/comment/<int:post_id>', methods=['POST'])
 def add_comment(post_id):
-    text = request.form.get('comment_text')
-    # Save 'text' to database linked to 'post_id'
-    return redirect(url_for('feed'))
+    """Adds a comment to a post and goes back to the page it was written on."""
+    db = helpers.load_db()
+
+    if 'username' not in session:
+        flask.flash('Please log in first.', 'warning')
+        return flask.redirect(flask.url_for('login.loginscreen'))
+
+    user = flask.g.user
+    if not user:
+        flask.flash('Invalid session. Please log in again.', 'danger')
+        session.clear()
+        return flask.redirect(flask.url_for('login.loginscreen'))
+
+    text = flask.request.form.get('comment_text', '').strip()
+    if not text:
+        flask.flash('Please write a comment first.', 'warning')
+    elif len(text) > comments.MAX_LENGTH:
+        flask.flash('That comment is too long!', 'warning')
+    elif comments.add_comment(db, post_id, user, text) is None:
+        flask.flash('That post no longer exists.', 'danger')
+
+    return flask.redirect(flask.request.referrer or flask.url_for('login.index'))
+
+@blueprint.route('/comments/<int:post_id>')
+def post_comments(post_id):
+    """Returns the page of a post's comments before the ``before`` cursor.
+
+    Like :func:`more_posts`, the page comes back as HTML (oldest first, to
+    go above the comments already shown) with the next cursor in the
+    ``X-Next-Cursor`` header, or as JSON when ``format=json`` is given.
+    """
+    db = helpers.load_db()
+
+    if 'username' not in session:
+        return flask.jsonify({'status': 'error', 'message': 'Please log in first.'}), 401
+
+    before = posts.parse_cursor(flask.request.args.get('before'))
+    if flask.request.args.get('before') and before is None:
+        return flask.jsonify({'status': 'error', 'message': 'Invalid cursor.'}), 400
+    page = comments.get_comments(db, post_id, before=before)
+    cursor = posts.next_cursor(page, comments.PAGE_SIZE)
+
+    if flask.request.args.get('format') == 'json':
+        return flask.jsonify({
+            'comments': [dict(comment, id=comment.doc_id) for comment in page],
+            'next': cursor
+        })
+
+    response = flask.make_response(flask.render_template('comments.html', comments=page[::-1]))
+    response.headers['X-Next-Cursor'] = cursor or ''
+    return response
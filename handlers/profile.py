@@ -1,17 +1,12 @@
-import os
 import flask
 from flask import Blueprint, request, redirect, url_for, flash, render_template, make_response, current_app, session
-from werkzeug.utils import secure_filename
+from db import blobs
 from db.helpers import load_db
-from db.users import get_user_by_name, update_user_profile, add_user_photo
+from db.users import update_user_profile, add_user_photo
+from handlers import uploads
 
 blueprint = Blueprint('profile', __name__)
 
-ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif'}
-
-def allowed_file(filename):
-    return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
-
 # ---------------------------
 # Edit Profile Page
 # ---------------------------
@@ -23,7 +18,7 @@ def edit_profile():
 
     username = session['username']
     db = load_db()
-    user = get_user_by_name(db, username)
+    user = flask.g.user
 
     if not user:
         flash("User not found!", "danger")
@@ -64,29 +59,24 @@ def upload_photo():
 
     username = session['username']
     db = load_db()
-    user = get_user_by_name(db, username)
+    user = flask.g.user
 
     if not user:
         flash("User profile not found!", "danger")
         return redirect(url_for("profile.edit_profile"))
 
-    file = request.files.get('photo')
-    if not file or not allowed_file(file.filename):
-        flash("Invalid file type! Please upload PNG, JPG, JPEG, or GIF.", "danger")
+    # The photo was streamed into the blob store's temporary area and checked
+    # while the request was parsed (see handlers/uploads.py)
+    photo_path = uploads.save_image(db, request.files.get('photo'))
+    if photo_path is None:
+        flash("Please choose a photo to upload.", "warning")
         return redirect(url_for('profile.edit_profile'))
 
-    filename = secure_filename(file.filename)
-    upload_folder = os.path.join("static/uploads", username)
-    os.makedirs(upload_folder, exist_ok=True)
-
-    path = os.path.join(upload_folder, filename)
-    file.save(path)
-
     # Save photo path to database
-    photo_path = f"/static/uploads/{username}/{filename}"
     if add_user_photo(db, username, photo_path):
         flash("Photo uploaded successfully!", "success")
     else:
+        blobs.release(db, photo_path)
         flash("Failed to save photo!", "danger")
 
     return redirect(url_for('profile.edit_profile'))
@@ -1,51 +1,76 @@
-from flask import Blueprint, render_template, request, session, jsonify, redirect, url_for 
-# Assume you import necessary db functions:
-from db.users import get_unseen_candidates, get_user_by_name
-from db.matches import save_match, check_mutual_like, get_matches_for_user
+from flask import Blueprint, render_template, request, session, jsonify, redirect, url_for, g
+from db import helpers
+from db.candidates import next_candidates, card
+from db.matches import save_match, save_matches, check_mutual_like, get_matches_for_user
 
 swipe_bp = Blueprint("swipe", __name__)
 
-# handlers/swipe.py
+# Number of cards handed to swipe.js at a time
+PREFETCH_SIZE = 5
+
+# Largest number of swipes accepted in one batch
+MAX_BATCH_SIZE = 100
+
+SWIPE_ACTIONS = ("like", "dislike")
 
 @swipe_bp.route("/swipe")
 def swipe():
     # 1. Get the current user from the session
-    current_user_data = session.get("user")
-    if not current_user_data:
+    current_username = session.get("username")
+    if not current_username:
         # Redirect to login if user not logged in
-        return redirect(url_for('login.login_page')) 
-
-    current_username = current_user_data["username"]
-
-    # 2. Get a list of candidates the user has NOT yet swiped on (UNSEEN)
-    # This function is crucial and needs to be created/updated in db/users.py
-    candidates = get_unseen_candidates(current_username)
-    FALLBACK_CANDIDATE = {
-        "username": "Gus the Ghost",
-        "age": "???",
-        "bio": "I haunt the swipe deck. Check back later!",
-        "profile_pic": url_for('static', filename='images/placeholder_ghost.png')
-    }
-    
-    # Check if we have a candidate to show
-    if not candidates:
-        # Pass only the first candidate to the template for the top card
-        candidates = [FALLBACK_CANDIDATE]
+        return redirect(url_for('login.loginscreen'))
+
+    db = helpers.load_db()
+    user = g.user
+
+    # 2. The next few users from the user's deck; the first one goes on the
+    # top card and swipe.js keeps the rest to show without a page reload
+    cards = [card(candidate) for candidate in next_candidates(db, current_username, PREFETCH_SIZE)]
+
+    return render_template("swipe.html", user=user,
+            candidate=cards[0] if cards else None, queued=cards[1:])
+
+
+@swipe_bp.route("/swipe/candidates")
+def candidates():
+    """Hands swipe.js the next cards of the user's deck."""
+    current_username = session.get("username")
+    if not current_username:
+        return jsonify({"status": "error", "message": "Please log in first."}), 401
+
+    count = request.args.get('n', PREFETCH_SIZE, type=int)
+    count = max(1, min(count, 4 * PREFETCH_SIZE))
+
+    db = helpers.load_db()
+    return jsonify({
+        "status": "success",
+        "candidates": [card(candidate) for candidate in next_candidates(db, current_username, count)]
+    })
 
-    # We only render the page with ONE candidate at a time for the single-card swipe
-    return render_template("swipe.html", user=current_user_data, candidate=next_candidate)
 
+def _is_target(user_id, liker_username):
+    """Whether the ``user_id`` of a swipe names someone else."""
+    return isinstance(user_id, str) and user_id != '' and user_id != liker_username
 
-@swipe_bp.route("/swipe", endpoint="swipe_page")
+
+@swipe_bp.route("/swipe", methods=["POST"], endpoint="swipe_page")
 def swipe_action():
     # Use request.json (standard for Flask with application/json data)
-    data = request.json
+    data = request.get_json(silent=True)
     
     # Validate required data fields
-    if not data or 'user_id' not in data or 'action' not in data:
+    if not isinstance(data, dict) or 'user_id' not in data or 'action' not in data:
         return jsonify({"status": "error", "message": "Missing action or user_id"}), 400
 
-    liker_username = session["user"]["username"]
+    liker_username = session.get("username")
+    if not liker_username:
+        return jsonify({"status": "error", "message": "Please log in first."}), 401
+
+    if not _is_target(data["user_id"], liker_username):
+        return jsonify({"status": "error", "message": "Invalid user_id"}), 400
+
+    db = helpers.load_db()
     target_username = data["user_id"] # Matches the data-user-id from swipe.js
     action = data["action"] # 'like' or 'dislike'
 
@@ -54,18 +79,16 @@ def swipe_action():
     # 1. Process the Action
     if action == "like":
         # Save the like action in the database
-        save_match(liker_username, target_username, action="like") 
+        save_match(db, liker_username, target_username, action="like") 
         
         # 2. Check for a Mutual Match (The Core Logic)
         # We check if the target user previously liked the current user (liker)
-        if check_mutual_like(target_username, liker_username):
+        if check_mutual_like(db, target_username, liker_username):
             is_match = True
-            # Optional: You might want to save a formal 'MATCH' record here
-            # save_match(liker_username, target_username, action="match") 
 
     elif action == "dislike":
         # Save the dislike action (optional, but good for not reshowing the user)
-        save_match(liker_username, target_username, action="dislike")
+        save_match(db, liker_username, target_username, action="dislike")
         
     else:
         return jsonify({"status": "error", "message": "Invalid action"}), 400
@@ -87,3 +110,37 @@ def swipe_action():
             "match": False
         })
 
+
+@swipe_bp.route("/swipe/batch", methods=["POST"])
+def swipe_batch():
+    """Records a batch of swipes buffered by swipe.js.
+
+    Expects ``{"swipes": [{"user_id": ..., "action": "like" | "dislike"}, ...]}``
+    and answers with every match the batch produced.
+    """
+    data = request.get_json(silent=True)
+    swipes = data.get("swipes") if isinstance(data, dict) else None
+
+    if not isinstance(swipes, list) or not swipes:
+        return jsonify({"status": "error", "message": "Missing swipes"}), 400
+    if len(swipes) > MAX_BATCH_SIZE:
+        return jsonify({"status": "error", "message": "Too many swipes"}), 400
+
+    liker_username = session.get("username")
+    if not liker_username:
+        return jsonify({"status": "error", "message": "Please log in first."}), 401
+
+    for record in swipes:
+        if not isinstance(record, dict) or not _is_target(record.get("user_id"), liker_username) \
+                or record.get("action") not in SWIPE_ACTIONS:
+            return jsonify({"status": "error", "message": "Invalid swipe record"}), 400
+
+    db = helpers.load_db()
+    matched = save_matches(db, liker_username,
+            [(record["user_id"], record["action"]) for record in swipes])
+
+    return jsonify({
+        "status": "success",
+        "saved": len(swipes),
+        "matches": matched
+    })
@@ -0,0 +1,142 @@
+"""Streaming image uploads.
+
+Werkzeug normally parses a multipart upload into a spooled temporary file
+and the handler copies it somewhere afterwards. :class:`UploadRequest` hands
+the parser an :class:`UploadStream` instead, which writes each chunk straight
+to a temporary file in the blob store while hashing it, checks the first
+bytes against the image formats we accept and enforces the size limit as
+data arrives. A file that isn't an image or is too big stops the parse right
+there (with :class:`RejectedUpload` or :class:`UploadTooLarge`), and an
+accepted one is moved into the blob store with a rename.
+"""
+import hashlib
+import os
+import shutil
+import tempfile
+
+import flask
+from werkzeug.exceptions import RequestEntityTooLarge, UnsupportedMediaType
+
+from db import blobs
+from handlers import images
+
+#: Largest file accepted per upload, in bytes
+MAX_UPLOAD_SIZE = 5 * 1024 * 1024
+
+#: Leading bytes of each accepted image format, and the extension it's stored with
+SIGNATURES = [
+    (b'\xff\xd8\xff', '.jpg'),
+    (b'\x89PNG\r\n\x1a\n', '.png'),
+    (b'GIF87a', '.gif'),
+    (b'GIF89a', '.gif'),
+]
+
+#: Number of leading bytes needed to recognise a format
+SNIFF_SIZE = max(len(magic) for magic, _ in SIGNATURES)
+
+
+class RejectedUpload(UnsupportedMediaType):
+    description = 'Invalid file type! Please upload PNG, JPG, JPEG, or GIF.'
+
+
+class UploadTooLarge(RequestEntityTooLarge):
+    description = 'That file is too big! Images can be at most 5MB.'
+
+
+def sniff(head):
+    """The extension of the image format ``head`` starts with, or ``None``."""
+    for magic, ext in SIGNATURES:
+        if head.startswith(magic):
+            return ext
+    return None
+
+
+class UploadStream:
+    """A write-through container for one uploaded file.
+
+    Reads, seeks and the like go to the temporary file underneath. Unless
+    :meth:`commit` moved it into the blob store, the temporary file is
+    deleted when the stream is closed (Flask closes uploads at the end of
+    the request).
+    """
+
+    def __init__(self, limit=MAX_UPLOAD_SIZE):
+        os.makedirs(blobs.BLOB_DIR, exist_ok=True)
+        fd, self.path = tempfile.mkstemp(dir=blobs.BLOB_DIR, suffix='.upload')
+        self._file = os.fdopen(fd, 'w+b')
+        self._hash = hashlib.sha256()
+        self._head = b''
+        self._limit = limit
+        self._committed = False
+        self.size = 0
+        self.ext = None
+
+    def write(self, data):
+        self.size += len(data)
+        if self.size > self._limit:
+            self.close()
+            raise UploadTooLarge()
+        if self.ext is None:
+            self._head += data[:SNIFF_SIZE - len(self._head)]
+            self.ext = sniff(self._head)
+            if self.ext is None and len(self._head) >= SNIFF_SIZE:
+                self.close()
+                raise RejectedUpload()
+        self._hash.update(data)
+        return self._file.write(data)
+
+    def commit(self, db):
+        """Move the file into the blob store; returns its URL and whether it
+        is new (see :func:`db.blobs.add_blob`)."""
+        self._file.close()
+        url, is_new = blobs.add_blob(db, self.path, self._hash.hexdigest(), self.ext)
+        self._committed = True
+        return url, is_new
+
+    def close(self):
+        self._file.close()
+        if not self._committed and os.path.exists(self.path):
+            os.remove(self.path)
+
+    def __getattr__(self, name):
+        return getattr(self._file, name)
+
+
+class UploadRequest(flask.Request):
+    """A request that streams uploaded files through :class:`UploadStream`."""
+
+    def _get_file_stream(self, total_content_length, content_type,
+                         filename=None, content_length=None):
+        return UploadStream()
+
+
+def save_image(db, file):
+    """Store an uploaded image in the blob store and start resizing it.
+
+    Returns the image's URL, or ``None`` if no file was sent. Raises
+    :class:`RejectedUpload` if the file isn't a PNG, JPEG or GIF.
+    """
+    if not file or not file.filename:
+        return None
+    stream = file.stream
+    if not isinstance(stream, UploadStream):
+        # parsed by a plain Request; run it through the same checks
+        stream = UploadStream()
+        file.stream.seek(0)
+        shutil.copyfileobj(file.stream, stream)
+    if stream.size == 0 or stream.ext is None:
+        stream.close()
+        if stream.size == 0:
+            return None
+        raise RejectedUpload()
+
+    url, is_new = stream.commit(db)
+    if is_new:
+        images.schedule_variants(blobs.path_of(url))
+    return url
+
+
+def rejected(error):
+    """Send the user back to the page they uploaded from with the reason."""
+    flask.flash(error.description, 'danger')
+    return flask.redirect(flask.request.referrer or flask.url_for('login.index'))
@@ -0,0 +1,35 @@
+document.addEventListener('DOMContentLoaded', () => {
+    // Like buttons on post cards post to /like/<id> or /unlike/<id> and show
+    // the count the server answers with. Clicks are caught on the document so
+    // cards added by "Load more" work too.
+    const csrfToken = document.querySelector('meta[name="csrf-token"]').content;
+
+    document.addEventListener('click', event => {
+        const button = event.target.closest('.like-button');
+        if (!button || button.dataset.busy) return;
+
+        const liked = button.dataset.liked === 'true';
+        button.dataset.busy = 'true';
+
+        fetch(liked ? button.dataset.unlikeUrl : button.dataset.likeUrl, {
+            method: 'POST',
+            headers: { 'X-CSRFToken': csrfToken }
+        })
+            .then(response => {
+                if (!response.ok) {
+                    throw new Error('Network response was not ok');
+                }
+                return response.json();
+            })
+            .then(data => {
+                button.dataset.liked = data.liked ? 'true' : 'false';
+                button.classList.toggle('liked', data.liked);
+                const icon = button.querySelector('.fa-heart');
+                icon.classList.toggle('fas', data.liked);
+                icon.classList.toggle('far', !data.liked);
+                button.querySelector('.like-count').textContent = data.likes;
+            })
+            .catch(error => console.error('Error liking post:', error))
+            .finally(() => { delete button.dataset.busy; });
+    });
+});
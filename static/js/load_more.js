@@ -0,0 +1,38 @@
+document.addEventListener('DOMContentLoaded', () => {
+    // "Load more" buttons fetch the next page of posts (or comments) as an
+    // HTML fragment and add it to their target list, at the end unless the
+    // button's data-position says otherwise. The server sends the cursor
+    // for the page after that in the X-Next-Cursor header (empty on the
+    // last page). Clicks are caught on the document so buttons inside
+    // loaded fragments work too.
+    document.addEventListener('click', event => {
+        const button = event.target.closest('.load-more');
+        if (!button || button.disabled) return;
+
+        const list = document.getElementById(button.dataset.target);
+        const url = new URL(button.dataset.url, window.location.origin);
+        url.searchParams.set('before', button.dataset.cursor);
+        button.disabled = true;
+
+        fetch(url)
+            .then(response => {
+                if (!response.ok) {
+                    throw new Error('Network response was not ok');
+                }
+                button.dataset.cursor = response.headers.get('X-Next-Cursor') || '';
+                return response.text();
+            })
+            .then(html => {
+                list.insertAdjacentHTML(button.dataset.position || 'beforeend', html);
+                if (button.dataset.cursor) {
+                    button.disabled = false;
+                } else {
+                    button.remove();
+                }
+            })
+            .catch(error => {
+                console.error('Error loading more:', error);
+                button.disabled = false;
+            });
+    });
+});
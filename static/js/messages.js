@@ -0,0 +1,38 @@
+document.addEventListener('DOMContentLoaded', () => {
+    // New messages are pushed over a Server-Sent Events stream and appended,
+    // instead of reloading the whole conversation. Browsers without
+    // EventSource poll for them instead.
+    const chat = document.getElementById('chat-messages');
+    if (!chat) return;
+
+    const POLL_INTERVAL = 3000; // ms
+    let latest = parseFloat(chat.dataset.latest) || 0;
+
+    const appendMessage = (message) => {
+        if (message.timestamp <= latest) return;
+        latest = message.timestamp;
+
+        const line = document.createElement('p');
+        const sender = document.createElement('strong');
+        sender.textContent = `${message.sender}:`;
+        line.appendChild(sender);
+        line.appendChild(document.createTextNode(` ${message.text}`));
+        chat.appendChild(line);
+    };
+
+    if (window.EventSource) {
+        // the browser reconnects by itself, resuming from the last event id
+        const stream = new EventSource(`${chat.dataset.streamUrl}?since=${latest}`);
+        stream.onmessage = (event) => appendMessage(JSON.parse(event.data));
+        return;
+    }
+
+    const poll = () => {
+        fetch(`${chat.dataset.url}?since=${latest}`)
+            .then(response => response.json())
+            .then(data => (data.messages || []).forEach(appendMessage))
+            .catch(error => console.error('Error fetching messages:', error));
+    };
+
+    setInterval(poll, POLL_INTERVAL);
+});
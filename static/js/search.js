@@ -0,0 +1,51 @@
+document.addEventListener('DOMContentLoaded', () => {
+    // Suggest usernames in the search box's datalist as the user types.
+    // Requests are debounced, and a response that arrives after the input
+    // has changed again is ignored.
+    const DEBOUNCE_MS = 150;
+    const input = document.getElementById('searchName');
+    if (!input) {
+        return;
+    }
+    const list = document.getElementById(input.getAttribute('list'));
+    let timer = null;
+    let latest = '';
+
+    function showSuggestions(names) {
+        list.replaceChildren(...names.map(name => {
+            const option = document.createElement('option');
+            option.value = name;
+            return option;
+        }));
+    }
+
+    function suggest() {
+        const query = input.value.trim();
+        latest = query;
+        if (!query) {
+            showSuggestions([]);
+            return;
+        }
+        const url = new URL(input.dataset.suggestUrl, window.location.origin);
+        url.searchParams.set('q', query);
+
+        fetch(url)
+            .then(response => {
+                if (!response.ok) {
+                    throw new Error('Network response was not ok');
+                }
+                return response.json();
+            })
+            .then(data => {
+                if (query === latest) {
+                    showSuggestions(data.users.map(user => user.username));
+                }
+            })
+            .catch(error => console.error('Error fetching suggestions:', error));
+    }
+
+    input.addEventListener('input', () => {
+        clearTimeout(timer);
+        timer = setTimeout(suggest, DEBOUNCE_MS);
+    });
+});
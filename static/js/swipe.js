@@ -12,46 +12,140 @@ document.addEventListener('DOMContentLoaded', () => {
 
     if (!card) return; // Exit if no card is present
 
-    // Function to handle the swipe action (communicate with backend)
-    const handleSwipeAction = (direction) => {
-        // We use the ID to identify the user currently on the card
-        const userId = card.getAttribute('data-user-id'); 
-        
-        // 🎯 AJAX Request to Python Backend (e.g., /swipe)
-        fetch('/swipe', {
+    // --- Card Queue ---
+    // The server renders the top card and hands us the next few as JSON;
+    // more are fetched from /swipe/candidates before we run out.
+    const csrfToken = document.querySelector('meta[name="csrf-token"]').content;
+    const queue = JSON.parse(document.getElementById('queued-cards').textContent);
+    const seen = new Set([card.getAttribute('data-user-id')]);
+    queue.forEach(candidate => seen.add(candidate.username));
+    const PREFETCH_WHEN_BELOW = 2;
+    let fetching = null;
+
+    const prefetch = () => {
+        if (fetching) return fetching;
+        // send buffered swipes first so the server's deck skips those users
+        fetching = flushSwipes()
+            .then(() => fetch('/swipe/candidates?n=5'))
+            .then(response => response.json())
+            .then(data => {
+                (data.candidates || []).forEach(candidate => {
+                    if (!seen.has(candidate.username)) {
+                        seen.add(candidate.username);
+                        queue.push(candidate);
+                    }
+                });
+            })
+            .catch(error => console.error('Error fetching candidates:', error))
+            .finally(() => { fetching = null; });
+        return fetching;
+    };
+
+    // Put the next queued candidate on the card, or show the empty message
+    const showNextCard = () => {
+        const next = queue.shift();
+        if (!next) {
+            card.remove();
+            document.querySelector('.swipe-buttons').remove();
+            document.getElementById('no-cards').hidden = false;
+            return;
+        }
+
+        card.setAttribute('data-user-id', next.username);
+        card.innerHTML = '';
+        if (next.photo) {
+            const img = document.createElement('img');
+            img.src = next.photo;
+            img.alt = next.username;
+            img.draggable = false;
+            card.appendChild(img);
+        }
+        const name = document.createElement('h3');
+        name.textContent = next.username;
+        card.appendChild(name);
+        const bio = document.createElement('p');
+        bio.className = 'text-center text-muted';
+        bio.textContent = next.bio || '';
+        card.appendChild(bio);
+
+        resetCard();
+
+        if (queue.length < PREFETCH_WHEN_BELOW) prefetch();
+    };
+
+    // --- Swipe Buffer ---
+    // Swipes are buffered and sent to /swipe/batch in one request once
+    // enough have piled up, every few seconds, or when the page is left.
+    const FLUSH_SIZE = 10;
+    const FLUSH_INTERVAL = 5000; // ms
+    const MAX_BATCH = 100; // MAX_BATCH_SIZE in handlers/swipe.py
+    let pending = [];
+
+    const flushSwipes = (keepalive = false) => {
+        if (!pending.length) return Promise.resolve();
+        const batch = pending.splice(0, MAX_BATCH);
+
+        return fetch('/swipe/batch', {
             method: 'POST',
+            keepalive: keepalive, // lets the request outlive the page
             headers: {
                 'Content-Type': 'application/json',
-                // If you use Flask/Django sessions, you might need a CSRF token here
+                'X-CSRFToken': csrfToken,
             },
-            body: JSON.stringify({ 
-                user_id: userId, 
-                action: direction // 'like' or 'dislike'
-            })
+            body: JSON.stringify({ swipes: batch })
         })
         .then(response => {
-            // Check for a success status before parsing JSON
+            if (response.status === 401) {
+                // the session ran out; the swipes can't be saved
+                window.location.href = '/loginscreen';
+                return {};
+            }
+            if (response.status >= 500) {
+                throw new Error(`Server error ${response.status}`);
+            }
             if (!response.ok) {
-                throw new Error('Network response was not ok');
+                // the server won't ever take this batch, so don't retry it
+                console.error('Swipes rejected:', response.status);
+                return {};
             }
             return response.json();
         })
         .then(data => {
-            console.log('Swipe Successful:', data);
-            
-            // Remove the card from the DOM after successful backend processing
-            card.remove(); 
-            
-            // 💡 Simplest way to load the next card is reloading the page.
-            // A better way is to use JavaScript to fetch and insert the next card's HTML.
-            window.location.reload(); 
+            (data.matches || []).forEach(username => {
+                alert(`It's a match with ${username}! 🤡`);
+            });
         })
         .catch(error => {
-            console.error('Error during swipe:', error);
-            // If the swipe fails, reset the card's position
-            resetCard();
-            alert('Failed to process swipe. Please try again.');
+            console.error('Error saving swipes:', error);
+            // network errors and server errors may pass; keep the swipes
+            // for the next flush
+            pending = batch.concat(pending);
+        });
+    };
+
+    setInterval(flushSwipes, FLUSH_INTERVAL);
+    window.addEventListener('pagehide', () => flushSwipes(true));
+    document.addEventListener('visibilitychange', () => {
+        if (document.visibilityState === 'hidden') flushSwipes(true);
+    });
+
+    // Function to handle the swipe action (buffer it and show the next card)
+    const handleSwipeAction = (direction) => {
+        // We use the ID to identify the user currently on the card
+        const userId = card.getAttribute('data-user-id');
+        pending.push({
+            user_id: userId,
+            action: direction // 'like' or 'dislike'
         });
+        if (pending.length >= FLUSH_SIZE) flushSwipes();
+
+        // Move on to the next candidate, waiting for a prefetch if the
+        // queue already ran dry
+        if (queue.length) {
+            showNextCard();
+        } else {
+            prefetch().then(showNextCard);
+        }
     };
 
     // Function to reset the card position and style
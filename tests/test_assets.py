@@ -0,0 +1,82 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import flask
+
+from handlers import assets
+
+
+class TestAssets(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.static = os.path.join(self.root, 'static')
+        for path, data in [('site.css', b'body {}'), ('js/app.js', b'go()'),
+                           ('uploads/bobo/photo.jpg', b'\xff\xd8\xff'), ('.site.css.swp', b'')]:
+            path = os.path.join(self.static, path)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'wb') as f:
+                f.write(data)
+
+        self.app = flask.Flask(__name__, static_folder=self.static)
+        self.app.config['SEND_FILE_MAX_AGE_DEFAULT'] = 0
+        assets.load_manifest(self.app.static_folder)
+        self.app.url_defaults(assets.add_fingerprint)
+        self.app.after_request(assets.cache_fingerprinted)
+        self.client = self.app.test_client()
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+        assets._manifest = {}
+
+    def test_manifest_skips_uploads_and_hidden_files(self):
+        self.assertEqual(sorted(assets._manifest), ['js/app.js', 'site.css'])
+
+    def test_manifest_follows_content(self):
+        before = assets.build_manifest(self.static)
+        with open(os.path.join(self.static, 'site.css'), 'wb') as f:
+            f.write(b'body { color: red }')
+        after = assets.build_manifest(self.static)
+        self.assertNotEqual(before['site.css'], after['site.css'])
+        self.assertEqual(before['js/app.js'], after['js/app.js'])
+
+    def test_static_urls_are_fingerprinted(self):
+        with self.app.test_request_context():
+            self.assertEqual(flask.url_for('static', filename='js/app.js'),
+                             '/static/js/app.js?v=' + assets._manifest['js/app.js'])
+            self.assertEqual(flask.url_for('static', filename='site.css'),
+                             '/static/site.css?v=' + assets._manifest['site.css'])
+            self.assertEqual(flask.url_for('static', filename='missing.css'), '/static/missing.css')
+
+    def test_fingerprinted_assets_are_immutable(self):
+        with self.app.test_request_context():
+            url = flask.url_for('static', filename='site.css')
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.cache_control.max_age, assets.MAX_AGE)
+        self.assertTrue(response.cache_control.immutable)
+        self.assertTrue(response.cache_control.public)
+        self.assertFalse(response.cache_control.no_cache)
+        response.close()
+
+    def test_stale_fingerprint_is_revalidated(self):
+        response = self.client.get('/static/site.css?v=000000000000')
+        self.assertFalse(response.cache_control.immutable)
+        self.assertEqual(response.cache_control.max_age, 0)
+        response.close()
+
+    def test_uploads_keep_etags(self):
+        response = self.client.get('/static/uploads/bobo/photo.jpg')
+        self.assertFalse(response.cache_control.immutable)
+        etag = response.headers['ETag']
+        response.close()
+        response = self.client.get('/static/uploads/bobo/photo.jpg',
+                                   headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+        response.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
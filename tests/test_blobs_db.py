@@ -0,0 +1,69 @@
+import io
+import os
+import shutil
+import tempfile
+import unittest
+import unittest.mock
+
+from tinydb.storages import MemoryStorage
+
+from db import blobs, helpers
+from db.storage import BatchingMiddleware
+
+
+class TestBlobs(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.patcher = unittest.mock.patch('db.blobs.BLOB_DIR', self.root)
+        self.patcher.start()
+        self.db = helpers.SharedTinyDB(storage=BatchingMiddleware(MemoryStorage))
+
+    def tearDown(self):
+        self.db.close()
+        self.patcher.stop()
+        shutil.rmtree(self.root)
+
+    def files(self):
+        return sorted(name for _, _, names in os.walk(self.root) for name in names)
+
+    def test_identical_uploads_are_stored_once(self):
+        url, is_new = blobs.store(self.db, io.BytesIO(b'honk'), '.JPG')
+        self.assertTrue(is_new)
+        self.assertTrue(url.startswith(blobs.BLOB_URL))
+        self.assertTrue(url.endswith('.jpg'))
+
+        again, is_new = blobs.store(self.db, io.BytesIO(b'honk'), '.png')
+        self.assertEqual(again, url)
+        self.assertFalse(is_new)
+        self.assertEqual(blobs.refs(self.db, url), 2)
+        self.assertEqual(len(self.files()), 1)
+
+        other, _ = blobs.store(self.db, io.BytesIO(b'squeak'), '.jpg')
+        self.assertNotEqual(other, url)
+        self.assertEqual(len(self.files()), 2)
+
+    def test_blob_is_named_after_its_contents(self):
+        url, _ = blobs.store(self.db, io.BytesIO(b'honk' * 100000), '.gif')
+        digest = os.path.basename(url).split('.')[0]
+        with open(blobs.blob_path(digest, '.gif'), 'rb') as f:
+            self.assertEqual(f.read(), b'honk' * 100000)
+
+    def test_last_release_deletes_blob_and_derived_files(self):
+        url, _ = blobs.store(self.db, io.BytesIO(b'honk'), '.jpg')
+        blobs.store(self.db, io.BytesIO(b'honk'), '.jpg')
+        digest = os.path.basename(url).split('.')[0]
+        open(blobs.blob_path(digest, '.thumb.jpg'), 'wb').close()
+
+        blobs.release(self.db, url)
+        self.assertEqual(len(self.files()), 2)
+        blobs.release(self.db, url)
+        self.assertEqual(self.files(), [])
+        self.assertEqual(blobs.refs(self.db, url), 0)
+
+        blobs.release(self.db, url)
+        blobs.release(self.db, '/static/uploads/bobo/photo.jpg')
+
+
+if __name__ == "__main__":
+    unittest.main()
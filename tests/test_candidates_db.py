@@ -0,0 +1,94 @@
+import unittest
+import unittest.mock
+
+from tinydb.storages import MemoryStorage
+
+from db import candidates, helpers, matches
+from db.storage import BatchingMiddleware
+
+
+class TestCandidates(unittest.TestCase):
+
+    def setUp(self):
+        self.db = helpers.SharedTinyDB(storage=BatchingMiddleware(MemoryStorage))
+        self.users = self.db.table('users')
+        for name in ['bobo', 'krusty', 'pennywise', 'ronald']:
+            self.add_user(name)
+
+    def tearDown(self):
+        self.db.close()
+
+    def add_user(self, name):
+        return self.users.insert({'username': name, 'friends': [], 'profile': {}})
+
+    def names(self, count=10):
+        return [user['username'] for user in candidates.next_candidates(self.db, 'bobo', count)]
+
+    def test_excludes_self_and_swiped(self):
+        matches.save_match(self.db, 'bobo', 'krusty', 'dislike')
+        self.assertEqual(sorted(self.names()), ['pennywise', 'ronald'])
+
+    def test_next_card_is_stable_until_swiped(self):
+        first = self.names(1)
+        self.assertEqual(self.names(1), first)
+
+        matches.save_match(self.db, 'bobo', first[0], 'like')
+        self.assertNotEqual(self.names(1), first)
+        self.assertEqual(len(self.names()), 2)
+
+    def test_new_users_join_existing_decks(self):
+        self.names()
+        self.add_user('pogo')
+        self.assertIn('pogo', self.names())
+
+    def test_removed_users_are_skipped(self):
+        self.names()
+        self.users.remove(doc_ids=[2])
+        self.assertNotIn('krusty', self.names())
+
+    def test_decks_are_dealt_in_chunks(self):
+        for i in range(50):
+            self.add_user('clown{}'.format(i))
+        with unittest.mock.patch.object(candidates, 'CHUNK_SIZE', 5):
+            self.assertEqual(len(self.names(3)), 3)
+            queue = candidates._cache(self.db)._queues['bobo']
+            self.assertEqual(len(queue._deck), 5)
+            self.assertEqual(sorted(self.names(100)),
+                             sorted(['krusty', 'pennywise', 'ronald'] +
+                                    ['clown{}'.format(i) for i in range(50)]))
+
+    def test_decks_share_the_username_list(self):
+        for name in ['bobo', 'krusty']:
+            candidates.next_candidates(self.db, name)
+        cache = candidates._cache(self.db)
+        self.assertIs(cache._queues['bobo']._names, cache._queues['krusty']._names)
+
+    def test_users_joining_after_the_deck_are_dealt_once(self):
+        self.names()
+        self.add_user('pogo')
+        self.add_user('homey')
+        self.users.remove(doc_ids=[2])
+        names = self.names(100)
+        self.assertEqual(len(names), len(set(names)))
+        self.assertEqual(sorted(names), ['homey', 'pennywise', 'pogo', 'ronald'])
+
+    def test_least_recently_used_decks_are_evicted(self):
+        with unittest.mock.patch.object(candidates, 'MAX_QUEUES', 2):
+            for name in ['bobo', 'krusty', 'pennywise']:
+                candidates.next_candidates(self.db, name)
+            self.assertEqual(list(candidates._cache(self.db)._queues), ['krusty', 'pennywise'])
+
+    def test_decks_are_bounded_by_the_names_they_hold(self):
+        for i in range(50):
+            self.add_user('clown{}'.format(i))
+        cache = candidates._cache(self.db)
+        with unittest.mock.patch.object(candidates, 'MAX_NAMES', 30):
+            for name in ['bobo', 'krusty', 'pennywise']:
+                candidates.next_candidates(self.db, name)
+            self.assertLessEqual(cache._held, 30)
+            self.assertEqual(cache._held, sum(len(queue) for queue in cache._queues.values()))
+            self.assertIn('pennywise', cache._queues)
+            self.assertNotIn('bobo', cache._queues)
+
+if __name__ == "__main__":
+    unittest.main()
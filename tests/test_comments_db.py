@@ -0,0 +1,86 @@
+import os
+import time
+import unittest
+import unittest.mock
+
+import tinydb
+from tinydb.storages import MemoryStorage
+
+from db import comments, helpers, posts
+from db.storage import BatchingMiddleware
+
+
+class TestComments(unittest.TestCase):
+
+    def make_db(self):
+        return helpers.SharedTinyDB(storage=BatchingMiddleware(MemoryStorage))
+
+    def setUp(self):
+        self.db = self.make_db()
+        self.bobo = {'username': 'bobo', 'friends': []}
+        self.first = posts.add_post(self.db, self.bobo, 'honk')
+        self.second = posts.add_post(self.db, self.bobo, 'honk honk')
+        self.now = 1000.0
+
+    def tearDown(self):
+        self.db.close()
+
+    def comment(self, post_id, text):
+        self.now += 1
+        with unittest.mock.patch('time.time', return_value=self.now):
+            return comments.add_comment(self.db, post_id, self.bobo, text)
+
+    def texts(self, found):
+        return [comment['text'] for comment in found]
+
+    def test_missing_posts_cannot_be_commented(self):
+        self.assertIsNone(comments.add_comment(self.db, 999, self.bobo, 'hello?'))
+        self.assertEqual(len(self.db.table('comments')), 0)
+
+    def test_comments_are_per_post_newest_first(self):
+        for text in ('a', 'b', 'c'):
+            self.comment(self.first, text)
+        self.comment(self.second, 'other')
+        self.assertEqual(self.texts(comments.get_comments(self.db, self.first)), ['c', 'b', 'a'])
+        self.assertEqual(self.texts(comments.get_comments(self.db, self.second)), ['other'])
+
+    def test_pages_follow_cursor(self):
+        for i in range(5):
+            self.comment(self.first, str(i))
+        page = comments.get_comments(self.db, self.first, limit=2)
+        self.assertEqual(self.texts(page), ['4', '3'])
+        cursor = posts.parse_cursor(posts.make_cursor(page[-1]))
+        page = comments.get_comments(self.db, self.first, limit=2, before=cursor)
+        self.assertEqual(self.texts(page), ['2', '1'])
+
+    def test_previews_for_a_page(self):
+        for text in ('a', 'b', 'c'):
+            self.comment(self.first, text)
+        self.comment(self.second, 'only')
+        previews = comments.comment_previews(self.db, [self.first, self.second, 999])
+        self.assertEqual(previews[self.first][0], 3)
+        self.assertEqual(self.texts(previews[self.first][1]), ['b', 'c'])
+        self.assertEqual(previews[self.second][0], 1)
+        self.assertEqual(self.texts(previews[self.second][1]), ['only'])
+        self.assertEqual(previews[999], (0, []))
+
+    def test_removed_comments_leave_the_post(self):
+        doc_id = self.comment(self.first, 'oops')
+        self.db.table('comments').remove(doc_ids=[doc_id])
+        self.assertEqual(comments.get_comments(self.db, self.first), [])
+        self.assertEqual(comments.comment_previews(self.db, [self.first])[self.first], (0, []))
+
+
+class TestCommentsPlainTinyDB(TestComments):
+
+    def make_db(self):
+        self.filename = '/tmp/youfacetestdb'+str(time.time())
+        return tinydb.TinyDB(self.filename)
+
+    def tearDown(self):
+        super().tearDown()
+        os.remove(self.filename)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,104 @@
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+import flask
+import markupsafe
+from tinydb.table import Document
+
+from handlers import fragments
+
+
+class TestFragmentCache(unittest.TestCase):
+
+    def test_lru_eviction_is_bounded_by_size(self):
+        html = '<p>{}</p>'.format('x' * 100)
+        cache = fragments.FragmentCache(max_bytes=3 * sys.getsizeof(html))
+        for key in 'abc':
+            cache.put(key, html)
+        cache.get('a')
+        cache.put('d', html)
+        self.assertEqual(len(cache), 3)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('a'), html)
+        self.assertLessEqual(cache.size, cache.max_bytes)
+
+    def test_oversized_fragments_are_not_kept(self):
+        cache = fragments.FragmentCache(max_bytes=10)
+        cache.put('a', 'x' * 100)
+        self.assertEqual(len(cache), 0)
+        self.assertEqual(cache.size, 0)
+
+    def test_replacing_a_key_keeps_the_size_right(self):
+        cache = fragments.FragmentCache()
+        cache.put('a', 'x' * 10)
+        cache.put('a', 'x' * 20)
+        self.assertEqual(cache.size, sys.getsizeof('x' * 20))
+
+    def test_resize_evicts(self):
+        cache = fragments.FragmentCache()
+        for key in range(10):
+            cache.put(key, 'x' * 100)
+        cache.resize(2 * sys.getsizeof('x' * 100))
+        self.assertEqual(len(cache), 2)
+        self.assertIsNotNone(cache.get(9))
+
+
+class TestPostCard(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        with open(os.path.join(self.root, 'card.html'), 'w') as f:
+            f.write('<p>@{{ post.user }} {{ post.text }} {{ ago }}</p>')
+        self.app = flask.Flask(__name__, template_folder=self.root)
+        self.renders = 0
+
+        @self.app.context_processor
+        def count():
+            self.renders += 1
+            return {}
+
+        self.old_cache = fragments.cache
+        fragments.cache = fragments.FragmentCache()
+
+    def tearDown(self):
+        fragments.cache = self.old_cache
+        shutil.rmtree(self.root)
+
+    def post(self, doc_id, text, time=1.0):
+        return Document({'user': 'bobo', 'text': text, 'time': time, 'image': None}, doc_id=doc_id)
+
+    def test_cards_are_rendered_once(self):
+        with self.app.test_request_context():
+            first = fragments.post_card('card.html', self.post(1, 'honk'), ago='now')
+            second = fragments.post_card('card.html', self.post(1, 'honk'), ago='now')
+        self.assertEqual(first, second)
+        self.assertEqual(self.renders, 1)
+        self.assertEqual(fragments.cache.hits, 1)
+
+    def test_cards_are_escaped_once(self):
+        with self.app.test_request_context():
+            fragments.post_card('card.html', self.post(1, '<b>honk</b>'))
+            html = fragments.post_card('card.html', self.post(1, '<b>honk</b>'))
+        self.assertIn('&lt;b&gt;honk&lt;/b&gt;', html)
+        self.assertIsInstance(html, markupsafe.Markup)
+
+    def test_state_and_identity_are_keyed(self):
+        with self.app.test_request_context():
+            self.assertIn('now', fragments.post_card('card.html', self.post(1, 'honk'), ago='now'))
+            self.assertIn('later', fragments.post_card('card.html', self.post(1, 'honk'), ago='later'))
+            # a reused doc id belongs to a post with another timestamp
+            self.assertIn('beep', fragments.post_card('card.html', self.post(1, 'beep', time=2.0)))
+        self.assertEqual(self.renders, 3)
+
+    def test_cache_size_follows_config(self):
+        self.app.config['FRAGMENT_CACHE_BYTES'] = 1024
+        with self.app.test_request_context():
+            fragments.post_card('card.html', self.post(1, 'honk'))
+        self.assertEqual(fragments.cache.max_bytes, 1024)
+
+
+if __name__ == '__main__':
+    unittest.main()
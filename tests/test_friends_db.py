@@ -0,0 +1,128 @@
+import os
+import time
+import unittest
+
+import tinydb
+from tinydb.storages import MemoryStorage
+
+from db import friends, helpers, users
+from db.friends import FriendGraph
+from db.storage import BatchingMiddleware
+
+
+def user(name, friends=()):
+    return {'username': name, 'friends': list(friends), 'profile': {}}
+
+
+class TestFriendGraph(unittest.TestCase):
+
+    def setUp(self):
+        self.graph = FriendGraph()
+
+    def test_edges_are_one_way(self):
+        self.graph.update(1, user('bobo', ['krusty']))
+        self.graph.update(2, user('krusty'))
+        self.assertTrue(self.graph.contains('bobo', 'krusty'))
+        self.assertFalse(self.graph.contains('krusty', 'bobo'))
+
+    def test_removed_friend_is_relinked_when_they_return(self):
+        self.graph.update(1, user('bobo', ['krusty']))
+        self.graph.update(2, user('krusty'))
+        self.graph.update(2, None)
+        self.assertFalse(self.graph.contains('bobo', 'krusty'))
+        self.graph.update(3, user('krusty'))
+        self.assertTrue(self.graph.contains('bobo', 'krusty'))
+
+    def test_updates_replace_edges(self):
+        for doc_id, name in enumerate(['krusty', 'pennywise'], 2):
+            self.graph.update(doc_id, user(name))
+        self.graph.update(1, user('bobo', ['krusty', 'pennywise']))
+        self.graph.update(1, user('bobo', ['pennywise']))
+        self.assertFalse(self.graph.contains('bobo', 'krusty'))
+        self.assertTrue(self.graph.contains('bobo', 'pennywise'))
+
+    def test_followers(self):
+        self.graph.update(1, user('bobo', ['krusty']))
+        self.graph.update(2, user('krusty'))
+        self.graph.update(3, user('pennywise', ['krusty', 'bobo']))
+        self.assertEqual(sorted(self.graph.followers('krusty')), ['bobo', 'pennywise'])
+        self.assertEqual(self.graph.followers('pennywise'), [])
+
+    def test_clear(self):
+        self.graph.update(1, user('bobo', ['krusty']))
+        self.graph.clear()
+        self.graph.update(2, user('krusty'))
+        self.assertFalse(self.graph.contains('bobo', 'krusty'))
+
+
+class TestFriends(unittest.TestCase):
+
+    def make_db(self):
+        return helpers.SharedTinyDB(storage=BatchingMiddleware(MemoryStorage))
+
+    def setUp(self):
+        self.db = self.make_db()
+        for name in ('bobo', 'krusty', 'pennywise', 'ronald', 'homey'):
+            users.new_user(self.db, name, 'pw')
+        self.befriend('bobo', 'krusty', 'pennywise')
+        self.befriend('krusty', 'ronald', 'homey', 'pennywise')
+        self.befriend('pennywise', 'ronald', 'bobo')
+
+    def tearDown(self):
+        self.db.close()
+
+    def befriend(self, name, *others):
+        for other in others:
+            users.add_user_friend(self.db, users.get_user_by_name(self.db, name), other)
+
+    def test_add_and_remove_friend(self):
+        bobo = users.get_user_by_name(self.db, 'bobo')
+        self.assertEqual(users.add_user_friend(self.db, bobo, 'krusty')[1], 'warning')
+        self.assertEqual(users.add_user_friend(self.db, bobo, 'bozo')[1], 'danger')
+        self.assertEqual(users.add_user_friend(self.db, bobo, 'ronald')[1], 'success')
+        self.assertEqual(users.remove_user_friend(self.db, bobo, 'krusty')[1], 'success')
+        self.assertEqual(users.remove_user_friend(self.db, bobo, 'krusty')[1], 'warning')
+
+        bobo = users.get_user_by_name(self.db, 'bobo')
+        self.assertEqual(bobo['friends'], ['pennywise', 'ronald'])
+        self.assertFalse(friends.is_friend(self.db, bobo, 'krusty'))
+        self.assertTrue(friends.is_friend(self.db, bobo, 'ronald'))
+
+    def test_deleted_user_leaves_friend_lists(self):
+        self.assertEqual(sorted(friends.followers(self.db, 'pennywise')), ['bobo', 'krusty'])
+        users.delete_user(self.db, 'pennywise', 'pw')
+        self.assertEqual(users.get_user_by_name(self.db, 'bobo')['friends'], ['krusty'])
+        self.assertEqual(users.get_user_by_name(self.db, 'krusty')['friends'], ['ronald', 'homey'])
+        self.assertEqual(friends.followers(self.db, 'pennywise'), [])
+
+    def test_unfriend_missing_user(self):
+        # left behind in a friend list by a deletion before they were cleaned up
+        bobo = users.get_user_by_name(self.db, 'bobo')
+        self.db.table('users').update({'friends': ['krusty', 'bozo']}, doc_ids=[bobo.doc_id])
+        self.assertEqual(users.remove_user_friend(self.db, bobo, 'bozo')[1], 'success')
+        self.assertEqual(users.get_user_by_name(self.db, 'bobo')['friends'], ['krusty'])
+
+    def test_mutual_friend_counts(self):
+        self.assertEqual(friends.mutual_friend_counts(self.db, 'bobo', ['krusty', 'ronald']),
+                         {'krusty': 1, 'ronald': 0})
+
+    def test_suggest_friends(self):
+        self.assertEqual(friends.suggest_friends(self.db, 'bobo'),
+                         [('ronald', 2), ('homey', 1)])
+        self.assertEqual(friends.suggest_friends(self.db, 'bobo', limit=1), [('ronald', 2)])
+        self.assertEqual(friends.suggest_friends(self.db, 'bozo'), [])
+
+
+class TestFriendsPlainTinyDB(TestFriends):
+
+    def make_db(self):
+        self.filename = '/tmp/youfacetestdb'+str(time.time())
+        return tinydb.TinyDB(self.filename)
+
+    def tearDown(self):
+        super().tearDown()
+        os.remove(self.filename)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,84 @@
+import os
+import shutil
+import tempfile
+import unittest
+import unittest.mock
+
+from PIL import Image
+
+from handlers import images
+
+
+class TestImageVariants(unittest.TestCase):
+
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.root = tempfile.mkdtemp()
+        os.chdir(self.root)
+        os.makedirs('static/uploads/bobo')
+        images._known.clear()
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        shutil.rmtree(self.root)
+
+    def save(self, name, size, fmt):
+        path = os.path.join('static/uploads/bobo', name)
+        Image.new('RGB', size, 'red').save(path, format=fmt)
+        return path
+
+    def width(self, path):
+        with Image.open(path) as image:
+            return image.width
+
+    def test_variants_are_bounded_by_width(self):
+        path = self.save('big.jpg', (2000, 1000), 'JPEG')
+        self.assertEqual(images.make_variants(path), ['thumb', 'feed', 'full'])
+        self.assertEqual(self.width(images.variant_path(path, 'thumb')), 160)
+        self.assertEqual(self.width(images.variant_path(path, 'feed')), 640)
+        self.assertEqual(self.width(images.variant_path(path, 'full')), 1280)
+
+    def test_exif_orientation_is_applied(self):
+        # a phone photo stored sideways, with EXIF saying to rotate it upright
+        path = os.path.join('static/uploads/bobo', 'phone.jpg')
+        exif = Image.Exif()
+        exif[0x0112] = 6
+        Image.new('RGB', (2000, 1000), 'red').save(path, format='JPEG', exif=exif)
+        images.make_variants(path)
+        with Image.open(images.variant_path(path, 'feed')) as feed:
+            self.assertEqual(feed.size, (640, 1280))
+
+    def test_small_images_only_get_a_thumbnail(self):
+        path = self.save('small.png', (300, 300), 'PNG')
+        self.assertEqual(images.make_variants(path), ['thumb'])
+
+        url = '/static/uploads/bobo/small.png'
+        self.assertEqual(images.srcset(url),
+                         '/static/uploads/bobo/small.thumb.png 160w, '
+                         '/static/uploads/bobo/small.png 640w')
+        self.assertEqual(images.variant_url(url, 'feed'), url)
+
+    def test_gifs_are_left_alone(self):
+        path = self.save('clown.gif', (800, 600), 'GIF')
+        self.assertEqual(images.make_variants(path), [])
+        self.assertEqual(images.srcset('/static/uploads/bobo/clown.gif'), '')
+
+    def test_scheduled_variants_are_served_once_done(self):
+        path = self.save('big.jpg', (2000, 1000), 'JPEG')
+        url = '/static/uploads/bobo/big.jpg'
+        with unittest.mock.patch.object(images, '_generate'):
+            images.schedule_variants(path).result()
+            self.assertEqual(images.variant_url(url, 'feed'), url)
+            self.assertEqual(images.srcset(url), '')
+        images.schedule_variants(path).result()
+        self.assertEqual(images.variant_url(url, 'feed'), '/static/uploads/bobo/big.feed.jpg')
+        self.assertIn('/static/uploads/bobo/big.full.jpg 1280w', images.srcset(url))
+
+    def test_other_urls_are_passed_through(self):
+        self.assertEqual(images.variant_url('https://i.pravatar.cc/150', 'thumb'),
+                         'https://i.pravatar.cc/150')
+        self.assertEqual(images.srcset(None), '')
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,96 @@
+import os
+import time
+import unittest
+
+import tinydb
+from tinydb.storages import MemoryStorage
+
+from db import helpers, likes, posts
+from db.likes import LikeIndex
+from db.storage import BatchingMiddleware
+
+
+class TestLikeIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.index = LikeIndex()
+
+    def test_counts_and_liked_sets(self):
+        self.index.update(1, {'post': 7, 'user': 'bobo'})
+        self.index.update(2, {'post': 7, 'user': 'krusty'})
+        self.index.update(3, {'post': 8, 'user': 'bobo'})
+        self.assertEqual(self.index.count(7), 2)
+        self.assertTrue(self.index.has_liked('bobo', 8))
+        self.assertFalse(self.index.has_liked('krusty', 8))
+        self.assertEqual(self.index.states([7, 8, 9], 'krusty'),
+                         {7: (2, True), 8: (1, False), 9: (0, False)})
+
+    def test_removal_forgets_the_like(self):
+        self.index.update(1, {'post': 7, 'user': 'bobo'})
+        self.index.update(1, None)
+        self.assertEqual(self.index.count(7), 0)
+        self.assertFalse(self.index.has_liked('bobo', 7))
+        self.assertIsNone(self.index.doc_id_of(7, 'bobo'))
+
+
+class TestLikes(unittest.TestCase):
+
+    def make_db(self):
+        return helpers.SharedTinyDB(storage=BatchingMiddleware(MemoryStorage))
+
+    def setUp(self):
+        self.db = self.make_db()
+        self.bobo = {'username': 'bobo', 'friends': []}
+        self.first = posts.add_post(self.db, self.bobo, 'honk')
+        self.second = posts.add_post(self.db, self.bobo, 'honk honk')
+
+    def tearDown(self):
+        self.db.close()
+
+    def test_like_is_idempotent(self):
+        self.assertEqual(likes.like_post(self.db, self.first, 'bobo'), 1)
+        self.assertEqual(likes.like_post(self.db, self.first, 'bobo'), 1)
+        self.assertEqual(likes.like_post(self.db, self.first, 'krusty'), 2)
+        self.assertEqual(likes.count(self.db, self.first), 2)
+        self.assertEqual(len(self.db.table('likes')), 2)
+
+    def test_unlike_is_idempotent(self):
+        likes.like_post(self.db, self.first, 'bobo')
+        self.assertEqual(likes.unlike_post(self.db, self.first, 'bobo'), 0)
+        self.assertEqual(likes.unlike_post(self.db, self.first, 'bobo'), 0)
+        self.assertEqual(len(self.db.table('likes')), 0)
+
+    def test_missing_posts_cannot_be_liked(self):
+        self.assertIsNone(likes.like_post(self.db, 999, 'bobo'))
+        self.assertIsNone(likes.unlike_post(self.db, 999, 'bobo'))
+        self.assertEqual(len(self.db.table('likes')), 0)
+
+    def test_like_states_for_a_page(self):
+        likes.like_post(self.db, self.first, 'bobo')
+        likes.like_post(self.db, self.first, 'krusty')
+        likes.like_post(self.db, self.second, 'krusty')
+        self.assertEqual(likes.like_states(self.db, [self.first, self.second], 'bobo'),
+                         {self.first: (2, True), self.second: (1, False)})
+        self.assertEqual(likes.like_states(self.db, [], 'bobo'), {})
+
+    def test_forget_user(self):
+        likes.like_post(self.db, self.first, 'bobo')
+        likes.like_post(self.db, self.first, 'krusty')
+        likes.forget_user(self.db, 'bobo')
+        self.assertEqual(likes.like_states(self.db, [self.first], 'bobo'),
+                         {self.first: (1, False)})
+
+
+class TestLikesPlainTinyDB(TestLikes):
+
+    def make_db(self):
+        self.filename = '/tmp/youfacetestdb'+str(time.time())
+        return tinydb.TinyDB(self.filename)
+
+    def tearDown(self):
+        super().tearDown()
+        os.remove(self.filename)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,77 @@
+import os
+import time
+import unittest
+
+import tinydb
+from tinydb.storages import MemoryStorage
+
+from db import helpers, matches
+from db.storage import BatchingMiddleware
+
+
+class TestMatches(unittest.TestCase):
+
+    def make_db(self):
+        return helpers.SharedTinyDB(storage=BatchingMiddleware(MemoryStorage))
+
+    def setUp(self):
+        self.db = self.make_db()
+
+    def tearDown(self):
+        self.db.close()
+
+    def test_save_match_dedupes(self):
+        first = matches.save_match(self.db, 'bobo', 'krusty', 'like')
+        again = matches.save_match(self.db, 'bobo', 'krusty', 'like')
+        self.assertEqual(first, again)
+        self.assertEqual(len(self.db.table('matches')), 1)
+
+    def test_swiping_again_replaces_action(self):
+        matches.save_match(self.db, 'bobo', 'krusty', 'like')
+        matches.save_match(self.db, 'bobo', 'krusty', 'dislike')
+        self.assertEqual(len(self.db.table('matches')), 1)
+        self.assertFalse(matches.check_mutual_like(self.db, 'bobo', 'krusty'))
+
+    def test_check_mutual_like(self):
+        matches.save_match(self.db, 'krusty', 'bobo', 'like')
+        self.assertTrue(matches.check_mutual_like(self.db, 'krusty', 'bobo'))
+        self.assertFalse(matches.check_mutual_like(self.db, 'bobo', 'krusty'))
+
+    def test_get_matches_for_user(self):
+        matches.save_match(self.db, 'bobo', 'krusty', 'like')
+        matches.save_match(self.db, 'krusty', 'bobo', 'like')
+        matches.save_match(self.db, 'bobo', 'pennywise', 'like')
+        matches.save_match(self.db, 'pennywise', 'bobo', 'dislike')
+        matches.save_match(self.db, 'ronald', 'bobo', 'like')
+        self.assertEqual(matches.get_matches_for_user(self.db, 'bobo'), ['krusty'])
+
+    def test_save_matches_batch(self):
+        matches.save_match(self.db, 'krusty', 'bobo', 'like')
+        matches.save_match(self.db, 'pennywise', 'bobo', 'like')
+        matched = matches.save_matches(self.db, 'bobo', [
+            ('krusty', 'like'), ('pennywise', 'dislike'), ('ronald', 'like')])
+        self.assertEqual(matched, ['krusty'])
+        self.assertEqual(matches.get_swiped_users(self.db, 'bobo'),
+                         {'krusty', 'pennywise', 'ronald'})
+
+    def test_get_swiped_users(self):
+        matches.save_match(self.db, 'bobo', 'krusty', 'like')
+        matches.save_match(self.db, 'bobo', 'pennywise', 'dislike')
+        matches.save_match(self.db, 'krusty', 'ronald', 'like')
+        self.assertEqual(matches.get_swiped_users(self.db, 'bobo'), {'krusty', 'pennywise'})
+
+
+class TestMatchesPlainTinyDB(TestMatches):
+    """The same behaviour without indexes, on an ordinary TinyDB."""
+
+    def make_db(self):
+        self.filename = '/tmp/youfacetestdb'+str(time.time())
+        return tinydb.TinyDB(self.filename)
+
+    def tearDown(self):
+        super().tearDown()
+        os.remove(self.filename)
+
+
+if __name__ == "__main__":
+    unittest.main()
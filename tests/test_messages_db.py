@@ -0,0 +1,46 @@
+import unittest
+import unittest.mock
+
+from tinydb.storages import MemoryStorage
+
+from db import helpers, messages
+from db.storage import BatchingMiddleware
+
+
+class TestConversations(unittest.TestCase):
+
+    def setUp(self):
+        self.db = helpers.SharedTinyDB(storage=BatchingMiddleware(MemoryStorage))
+        self.clock = iter(range(1, 1000))
+        self.patcher = unittest.mock.patch('time.time', lambda: next(self.clock))
+        self.patcher.start()
+
+    def tearDown(self):
+        self.patcher.stop()
+        self.db.close()
+
+    def texts(self, found):
+        return [m['text'] for m in found]
+
+    def test_conversation_has_both_directions_in_order(self):
+        messages.add_message(self.db, 'bobo', 'krusty', 'hi')
+        messages.add_message(self.db, 'bobo', 'pennywise', 'psst')
+        messages.add_message(self.db, 'krusty', 'bobo', 'honk')
+        messages.add_message(self.db, 'bobo', 'krusty', 'honk honk')
+
+        self.assertEqual(self.texts(messages.get_conversation(self.db, 'bobo', 'krusty')),
+                         ['hi', 'honk', 'honk honk'])
+        self.assertEqual(self.texts(messages.get_conversation(self.db, 'krusty', 'bobo')),
+                         ['hi', 'honk', 'honk honk'])
+
+    def test_since(self):
+        messages.add_message(self.db, 'bobo', 'krusty', 'one')
+        messages.add_message(self.db, 'krusty', 'bobo', 'two')
+        messages.add_message(self.db, 'bobo', 'krusty', 'three')
+        self.assertEqual(self.texts(messages.get_conversation(self.db, 'bobo', 'krusty', since=1)),
+                         ['two', 'three'])
+        self.assertEqual(messages.get_conversation(self.db, 'bobo', 'krusty', since=3), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
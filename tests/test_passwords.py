@@ -0,0 +1,35 @@
+import threading
+import unittest
+import unittest.mock
+
+from db import passwords
+
+
+class TestPasswords(unittest.TestCase):
+
+    def test_hashes_round_trip_through_the_pool(self):
+        pwhash = passwords.hash_password('honk')
+        self.assertNotEqual(pwhash, 'honk')
+        self.assertTrue(passwords.check_password(pwhash, 'honk'))
+        self.assertFalse(passwords.check_password(pwhash, 'beep'))
+
+    def test_inline_without_workers(self):
+        with unittest.mock.patch.object(passwords, 'WORKERS', 0), \
+                unittest.mock.patch.object(passwords, '_executor') as executor:
+            self.assertTrue(passwords.check_password(passwords.hash_password('honk'), 'honk'))
+        executor.assert_not_called()
+
+    def test_full_queue_is_refused(self):
+        with unittest.mock.patch.object(passwords, '_slots', threading.BoundedSemaphore(1)), \
+                unittest.mock.patch.object(passwords, 'QUEUE_TIMEOUT', 0):
+            passwords._slots.acquire()
+            with self.assertRaises(passwords.PasswordPoolBusy):
+                passwords.hash_password('honk')
+
+    @classmethod
+    def tearDownClass(cls):
+        passwords.shutdown()
+
+
+if __name__ == '__main__':
+    unittest.main()
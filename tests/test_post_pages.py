@@ -0,0 +1,60 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from db import comments, helpers, likes, posts, users
+
+
+class TestPostPages(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.root = tempfile.mkdtemp()
+        helpers.DB_PATH = os.path.join(cls.root, 'db.json')
+        import youface
+        cls.app = youface.app
+        cls.limiter = youface.limiter
+        cls.app.config['WTF_CSRF_ENABLED'] = False
+        db = helpers.load_db()
+        users.new_user(db, 'bobo', 'pw')
+        cls.post_id = posts.add_post(db, {'username': 'bobo'}, 'honk')
+        comments.add_comment(db, cls.post_id, {'username': 'bobo'}, 'beep')
+        likes.like_post(db, cls.post_id, 'bobo')
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.app.config['WTF_CSRF_ENABLED'] = True
+        helpers.close_db()
+        helpers.DB_PATH = 'db.json'
+        shutil.rmtree(cls.root)
+
+    def setUp(self):
+        self.limiter.reset()
+        self.client = self.app.test_client()
+        with self.client.session_transaction() as session:
+            session['username'] = 'bobo'
+
+    def test_more_posts_rejects_malformed_cursor(self):
+        for scope in ('feed', 'user', 'all'):
+            response = self.client.get('/posts/more?scope={}&user=bobo&before=nope'.format(scope))
+            self.assertEqual(response.status_code, 400)
+        response = self.client.get('/posts/more?scope=all&before=1e20,999')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'honk', response.data)
+
+    def test_comments_reject_malformed_cursor(self):
+        url = '/comments/{}'.format(self.post_id)
+        self.assertEqual(self.client.get(url + '?before=1,2,3').status_code, 400)
+        self.assertIn(b'beep', self.client.get(url).data)
+
+    def test_search_page_shows_likes_and_comments(self):
+        response = self.client.post('/searchUser', data={'searchName': 'bo'})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'<small class="like-count">1</small>', response.data)
+        self.assertIn(b'fas fa-heart', response.data)
+        self.assertIn(b'beep', response.data)
+
+
+if __name__ == "__main__":
+    unittest.main()
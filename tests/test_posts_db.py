@@ -0,0 +1,90 @@
+import unittest
+import unittest.mock
+
+from tinydb.storages import MemoryStorage
+
+from db import helpers, posts
+from db.storage import BatchingMiddleware
+
+
+class TestTimeline(unittest.TestCase):
+
+    def setUp(self):
+        self.db = helpers.SharedTinyDB(storage=BatchingMiddleware(MemoryStorage))
+        self.clock = iter(range(1, 1000))
+        self.patcher = unittest.mock.patch('time.time', lambda: next(self.clock))
+        self.patcher.start()
+
+    def tearDown(self):
+        self.patcher.stop()
+        self.db.close()
+
+    def post(self, username, text):
+        return posts.add_post(self.db, {'username': username}, text)
+
+    def texts(self, found):
+        return [post['text'] for post in found]
+
+    def test_get_posts_oldest_first(self):
+        self.post('bobo', 'one')
+        self.post('krusty', 'other')
+        self.post('bobo', 'two')
+        self.assertEqual(self.texts(posts.get_posts(self.db, {'username': 'bobo'})),
+                         ['one', 'two'])
+
+    def test_timeline_merges_authors_newest_first(self):
+        self.post('bobo', 'b1')
+        self.post('krusty', 'k1')
+        self.post('pennywise', 'p1')
+        self.post('bobo', 'b2')
+        self.post('krusty', 'k2')
+
+        timeline = posts.get_timeline(self.db, ['bobo', 'krusty'])
+        self.assertEqual(self.texts(timeline), ['k2', 'b2', 'k1', 'b1'])
+
+    def test_timeline_limit(self):
+        for i in range(30):
+            self.post('bobo', str(i))
+        timeline = posts.get_timeline(self.db, ['bobo'], limit=5)
+        self.assertEqual(self.texts(timeline), ['29', '28', '27', '26', '25'])
+
+    def test_removed_posts_leave_the_timeline(self):
+        first = self.post('bobo', 'one')
+        self.post('bobo', 'two')
+        self.db.table('posts').remove(doc_ids=[first])
+        self.assertEqual(self.texts(posts.get_timeline(self.db, ['bobo'])), ['two'])
+
+
+    def test_pages_follow_cursor(self):
+        for i in range(25):
+            self.post('bobo' if i % 2 else 'krusty', str(i))
+
+        first = posts.get_timeline(self.db, ['bobo', 'krusty'], limit=10)
+        cursor = posts.next_cursor(first, limit=10)
+        second = posts.get_timeline(self.db, ['bobo', 'krusty'], limit=10,
+                                    before=posts.parse_cursor(cursor))
+        self.assertEqual(self.texts(first), [str(i) for i in range(24, 14, -1)])
+        self.assertEqual(self.texts(second), [str(i) for i in range(14, 4, -1)])
+
+    def test_last_page_has_no_cursor(self):
+        for i in range(3):
+            self.post('bobo', str(i))
+        page = posts.get_user_posts(self.db, 'bobo', limit=5)
+        self.assertIsNone(posts.next_cursor(page, limit=5))
+
+    def test_recent_posts(self):
+        for i in range(5):
+            self.post('bobo' if i % 2 else 'krusty', str(i))
+        page = posts.get_recent_posts(self.db, limit=2)
+        self.assertEqual(self.texts(page), ['4', '3'])
+        page = posts.get_recent_posts(self.db, limit=2, before=posts.parse_cursor(posts.make_cursor(page[-1])))
+        self.assertEqual(self.texts(page), ['2', '1'])
+
+    def test_parse_cursor(self):
+        self.assertEqual(posts.parse_cursor('12.5,3'), (12.5, 3))
+        self.assertIsNone(posts.parse_cursor('nonsense'))
+        self.assertIsNone(posts.parse_cursor(None))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,63 @@
+import queue
+import unittest
+import unittest.mock
+
+from tinydb.storages import MemoryStorage
+
+from db import helpers, messages, pubsub
+from db.storage import BatchingMiddleware
+
+
+class TestBroker(unittest.TestCase):
+
+    def setUp(self):
+        self.broker = pubsub.Broker()
+
+    def test_publish_fans_out_to_subscribers(self):
+        first = self.broker.subscribe('room')
+        second = self.broker.subscribe('room')
+        other = self.broker.subscribe('elsewhere')
+        self.broker.publish('room', 'honk')
+
+        self.assertEqual(first.get_nowait(), 'honk')
+        self.assertEqual(second.get_nowait(), 'honk')
+        self.assertTrue(other.empty())
+
+    def test_unsubscribed_queues_get_nothing(self):
+        subscription = self.broker.subscribe('room')
+        self.broker.unsubscribe('room', subscription)
+        self.broker.publish('room', 'honk')
+        self.assertTrue(subscription.empty())
+
+    def test_slow_subscribers_drop_messages(self):
+        with unittest.mock.patch.object(pubsub.Broker, 'QUEUE_SIZE', 2):
+            subscription = self.broker.subscribe('room')
+        for i in range(5):
+            self.broker.publish('room', i)
+        self.assertEqual([subscription.get_nowait(), subscription.get_nowait()], [0, 1])
+        self.assertRaises(queue.Empty, subscription.get_nowait)
+
+
+class TestMessagePublishing(unittest.TestCase):
+
+    def setUp(self):
+        self.db = helpers.SharedTinyDB(storage=BatchingMiddleware(MemoryStorage))
+
+    def tearDown(self):
+        self.db.close()
+
+    def test_add_message_publishes_to_conversation(self):
+        key = messages.conversation_key('krusty', 'bobo')
+        subscription = pubsub.broker.subscribe(key)
+        try:
+            doc_id = messages.add_message(self.db, 'bobo', 'krusty', 'honk')
+            message = subscription.get_nowait()
+        finally:
+            pubsub.broker.unsubscribe(key, subscription)
+
+        self.assertEqual(message['id'], doc_id)
+        self.assertEqual(message['text'], 'honk')
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,70 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from db import helpers, posts, users
+
+
+class TestRateLimits(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.root = tempfile.mkdtemp()
+        helpers.DB_PATH = os.path.join(cls.root, 'db.json')
+        import youface
+        cls.app = youface.app
+        cls.limiter = youface.limiter
+        cls.app.config['WTF_CSRF_ENABLED'] = False
+        db = helpers.load_db()
+        users.new_user(db, 'bobo', 'pw')
+        cls.post_id = posts.add_post(db, {'username': 'bobo'}, 'honk')
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.app.config['WTF_CSRF_ENABLED'] = True
+        helpers.close_db()
+        helpers.DB_PATH = 'db.json'
+        shutil.rmtree(cls.root)
+
+    def setUp(self):
+        self.limiter.reset()
+        self.client = self.app.test_client()
+        with self.client.session_transaction() as session:
+            session['username'] = 'bobo'
+
+    def get_many(self, url, times):
+        return [self.client.get(url).status_code for _ in range(times)]
+
+    def test_one_limiter(self):
+        self.assertEqual(len(self.app.extensions['limiter']), 1)
+
+    def test_default_limit(self):
+        codes = self.get_many('/find-friends', 51)
+        self.assertEqual(set(codes[:50]), {200})
+        self.assertEqual(codes[50], 429)
+
+    def test_chat_polling_is_exempt(self):
+        self.assertEqual(set(self.get_many('/message/krusty/new', 60)), {200})
+
+    def test_suggestions_allow_120_per_minute(self):
+        codes = self.get_many('/searchUser/suggest?q=bo', 121)
+        self.assertEqual(set(codes[:120]), {200})
+        self.assertEqual(codes[120], 429)
+
+    def test_likes_allow_120_per_minute(self):
+        url = '/like/{}'.format(self.post_id)
+        codes = [self.client.post(url).status_code for _ in range(121)]
+        self.assertEqual(set(codes[:120]), {200})
+        self.assertEqual(codes[120], 429)
+
+    def test_login_allows_5_per_minute(self):
+        # the honeypot field turns the login away before any password work
+        codes = [self.client.post('/login', data={'are_you_a_bot': 'yes'}).status_code
+                 for _ in range(6)]
+        self.assertEqual(set(codes[:5]), {302})
+        self.assertEqual(codes[5], 429)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,175 @@
+import json
+import os
+import threading
+import time
+import unittest
+import unittest.mock
+
+from tinydb.storages import JSONStorage
+
+from db import helpers
+from db.storage import BatchingMiddleware, LogStorage
+
+
+class TestSharedDB(unittest.TestCase):
+
+    def setUp(self):
+        self.filename = '/tmp/youfacetestdb'+str(time.time())
+        self.storage = BatchingMiddleware(JSONStorage)
+        self.db = helpers.SharedTinyDB(self.filename, storage=self.storage)
+
+    def tearDown(self):
+        self.db.close()
+        os.remove(self.filename)
+
+    def read_file(self):
+        with open(self.filename) as f:
+            text = f.read()
+        return json.loads(text) if text else {}
+
+    def test_writes_are_batched(self):
+        with unittest.mock.patch.object(BatchingMiddleware, 'WRITE_CACHE_SIZE', 3):
+            users = self.db.table('users')
+            users.insert({'username': 'a'})
+            users.insert({'username': 'b'})
+            self.assertEqual(self.read_file(), {})
+            users.insert({'username': 'c'})
+        self.assertEqual(len(self.read_file()['users']), 3)
+
+    def test_flush_writes_pending_changes(self):
+        self.db.table('users').insert({'username': 'a'})
+        self.db.flush()
+        self.assertEqual(self.read_file()['users']['1'], {'username': 'a'})
+
+    def test_concurrent_inserts_get_unique_ids(self):
+        posts = self.db.table('posts')
+        ids = []
+
+        def worker():
+            for i in range(50):
+                ids.append(posts.insert({'text': str(i)}))
+
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(len(set(ids)), 400)
+        self.assertEqual(len(posts), 400)
+
+
+class TestLogStorage(unittest.TestCase):
+
+    def setUp(self):
+        self.filename = '/tmp/youfacetestdb'+str(time.time())
+        self.db = self.open_db()
+
+    def tearDown(self):
+        self.db.close()
+        for suffix in ('', '.log', '.log.1'):
+            if os.path.exists(self.filename + suffix):
+                os.remove(self.filename + suffix)
+
+    def open_db(self):
+        return helpers.SharedTinyDB(self.filename,
+                storage=BatchingMiddleware(LogStorage))
+
+    def reopen(self):
+        self.db.close()
+        self.db = self.open_db()
+
+    def test_changes_are_appended_to_the_log(self):
+        users = self.db.table('users')
+        users.insert({'username': 'a'})
+        self.db.flush()
+
+        self.assertEqual(os.path.getsize(self.filename), 0)
+        with open(self.filename + '.log') as f:
+            self.assertEqual(f.read(), '["set","users","1",{"username":"a"}]\n')
+
+    def test_log_is_replayed_on_open(self):
+        users = self.db.table('users')
+        a = users.insert({'username': 'a'})
+        b = users.insert({'username': 'b'})
+        users.update({'bio': 'hi'}, doc_ids=[a])
+        users.remove(doc_ids=[b])
+        self.db.table('posts').insert({'text': 'x'})
+        self.db.table('posts').truncate()
+        self.reopen()
+
+        self.assertEqual(self.db.table('users').all(), [{'username': 'a', 'bio': 'hi'}])
+        self.assertEqual(self.db.table('posts').all(), [])
+
+    def test_log_is_compacted_into_snapshot(self):
+        with unittest.mock.patch.object(LogStorage, 'COMPACT_SIZE', 200):
+            posts = self.db.table('posts')
+            for i in range(20):
+                posts.insert({'text': 'post number {}'.format(i)})
+                self.db.flush()
+            self.db.storage.storage._wait_for_compaction()
+
+        with open(self.filename) as f:
+            self.assertGreater(len(json.load(f)['posts']), 0)
+        self.assertLess(os.path.getsize(self.filename + '.log'), 200)
+        self.reopen()
+        self.assertEqual(len(self.db.table('posts')), 20)
+
+    def test_a_full_batch_keeps_its_last_write(self):
+        users = self.db.table('users')
+        for i in range(BatchingMiddleware.WRITE_CACHE_SIZE):
+            users.insert({'username': str(i)})
+        self.reopen()
+        self.assertEqual(len(self.db.table('users')), BatchingMiddleware.WRITE_CACHE_SIZE)
+
+    def test_sealed_log_left_by_a_crash_survives_the_next_seal(self):
+        self.db.close()
+        with open(self.filename, 'w') as f:
+            f.write('{}')
+        with open(self.filename + '.log.1', 'w') as f:
+            f.write(LogStorage.encode('set', 'users', 1, {'username': 'a'}))
+        with unittest.mock.patch.object(LogStorage, 'COMPACT_SIZE', 200):
+            self.db = self.open_db()
+            posts = self.db.table('posts')
+            for i in range(20):
+                posts.insert({'text': 'post number {}'.format(i)})
+                self.db.flush()
+            self.db.storage.storage._wait_for_compaction()
+        self.reopen()
+        self.assertEqual(self.db.table('users').all(), [{'username': 'a'}])
+        self.assertEqual(len(self.db.table('posts')), 20)
+
+    def test_untracked_write_falls_back_to_snapshot(self):
+        self.db.table('users').insert({'username': 'a'})
+        self.db.storage.write({'users': {'1': {'username': 'b'}}})
+        self.db.flush()
+
+        with open(self.filename) as f:
+            self.assertEqual(json.load(f), {'users': {'1': {'username': 'b'}}})
+        self.assertEqual(os.path.getsize(self.filename + '.log'), 0)
+
+
+class TestLoadDB(unittest.TestCase):
+
+    def setUp(self):
+        self.filename = '/tmp/youfacetestdb'+str(time.time())
+        self.patcher = unittest.mock.patch('db.helpers.DB_PATH', self.filename)
+        self.patcher.start()
+
+    def tearDown(self):
+        helpers.close_db()
+        self.patcher.stop()
+        for suffix in ('', '.log'):
+            os.remove(self.filename + suffix)
+
+    def test_load_db_is_shared(self):
+        self.assertIs(helpers.load_db(), helpers.load_db())
+
+    def test_close_db_flushes(self):
+        helpers.load_db().table('users').insert({'username': 'a'})
+        helpers.close_db()
+        self.assertEqual(len(helpers.load_db().table('users')), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
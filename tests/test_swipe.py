@@ -0,0 +1,55 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from db import helpers, matches, users
+
+
+class TestSwipeValidation(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.root = tempfile.mkdtemp()
+        helpers.DB_PATH = os.path.join(cls.root, 'db.json')
+        import youface
+        cls.app = youface.app
+        cls.limiter = youface.limiter
+        cls.app.config['WTF_CSRF_ENABLED'] = False
+        cls.db = helpers.load_db()
+        for name in ('bobo', 'krusty'):
+            users.new_user(cls.db, name, 'pw')
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.app.config['WTF_CSRF_ENABLED'] = True
+        helpers.close_db()
+        helpers.DB_PATH = 'db.json'
+        shutil.rmtree(cls.root)
+
+    def setUp(self):
+        self.limiter.reset()
+        self.client = self.app.test_client()
+        with self.client.session_transaction() as session:
+            session['username'] = 'bobo'
+
+    def test_single_swipe_needs_another_username(self):
+        for user_id in (['x'], 7, '', 'bobo'):
+            response = self.client.post('/swipe', json={'user_id': user_id, 'action': 'like'})
+            self.assertEqual(response.status_code, 400, user_id)
+        self.assertEqual(self.client.post('/swipe', json=['user_id', 'action']).status_code, 400)
+        response = self.client.post('/swipe', json={'user_id': 'krusty', 'action': 'dislike'})
+        self.assertEqual(response.status_code, 200)
+
+    def test_batch_needs_other_usernames(self):
+        for user_id in (['x'], 7, 'bobo'):
+            response = self.client.post('/swipe/batch', json={'swipes': [
+                {'user_id': 'krusty', 'action': 'like'},
+                {'user_id': user_id, 'action': 'like'}]})
+            self.assertEqual(response.status_code, 400, user_id)
+        # a rejected batch saves nothing
+        self.assertFalse(matches.has_swiped(self.db, 'bobo', 'krusty'))
+
+
+if __name__ == "__main__":
+    unittest.main()
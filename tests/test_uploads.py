@@ -0,0 +1,102 @@
+import io
+import os
+import shutil
+import tempfile
+import unittest
+import unittest.mock
+
+import flask
+from tinydb.storages import MemoryStorage
+
+from db import blobs, helpers
+from db.storage import BatchingMiddleware
+from handlers import uploads
+
+PNG = b'\x89PNG\r\n\x1a\n' + b'\x00' * 100
+
+
+class TestUploadStream(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.patcher = unittest.mock.patch('db.blobs.BLOB_DIR', self.root)
+        self.patcher.start()
+
+    def tearDown(self):
+        self.patcher.stop()
+        shutil.rmtree(self.root)
+
+    def test_sniffs_format_from_first_bytes(self):
+        stream = uploads.UploadStream()
+        stream.write(PNG[:4])
+        self.assertIsNone(stream.ext)
+        stream.write(PNG[4:])
+        self.assertEqual(stream.ext, '.png')
+        stream.close()
+        self.assertEqual(os.listdir(self.root), [])
+
+    def test_rejects_non_images_after_first_chunk(self):
+        stream = uploads.UploadStream()
+        with self.assertRaises(uploads.RejectedUpload):
+            stream.write(b'#!/bin/sh\nrm -rf /')
+        self.assertEqual(os.listdir(self.root), [])
+
+    def test_rejects_oversized_files_as_they_arrive(self):
+        stream = uploads.UploadStream(limit=50)
+        stream.write(PNG[:40])
+        with self.assertRaises(uploads.UploadTooLarge):
+            stream.write(PNG[40:])
+        self.assertEqual(os.listdir(self.root), [])
+
+
+class TestSaveImage(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.patcher = unittest.mock.patch('db.blobs.BLOB_DIR', self.root)
+        self.patcher.start()
+        self.db = helpers.SharedTinyDB(storage=BatchingMiddleware(MemoryStorage))
+
+        self.app = flask.Flask(__name__)
+        self.app.request_class = uploads.UploadRequest
+        self.app.register_error_handler(uploads.RejectedUpload, lambda e: ('rejected', 415))
+
+        @self.app.route('/upload', methods=['POST'])
+        def upload():
+            return uploads.save_image(self.db, flask.request.files.get('image')) or 'none'
+
+        self.client = self.app.test_client()
+
+    def tearDown(self):
+        self.db.close()
+        self.patcher.stop()
+        shutil.rmtree(self.root)
+
+    def upload(self, data, filename='clown.jpg'):
+        with unittest.mock.patch('handlers.images.schedule_variants'):
+            return self.client.post('/upload', content_type='multipart/form-data',
+                                    data={'image': (io.BytesIO(data), filename)})
+
+    def test_image_is_moved_into_blob_store(self):
+        response = self.upload(PNG)
+        url = response.get_data(as_text=True)
+        self.assertTrue(url.startswith(blobs.BLOB_URL))
+        self.assertTrue(url.endswith('.png'))
+        self.assertEqual(blobs.refs(self.db, url), 1)
+
+        self.assertEqual(self.upload(PNG, 'again.png').get_data(as_text=True), url)
+        self.assertEqual(blobs.refs(self.db, url), 2)
+        files = [name for _, _, names in os.walk(self.root) for name in names]
+        self.assertEqual(len(files), 1)
+
+    def test_extension_does_not_make_an_image(self):
+        response = self.upload(b'GIF? no, a zip file: PK\x03\x04', 'clown.gif')
+        self.assertEqual(response.status_code, 415)
+        self.assertEqual([name for _, _, names in os.walk(self.root) for name in names], [])
+
+    def test_no_file(self):
+        self.assertEqual(self.upload(b'', '').get_data(as_text=True), 'none')
+
+
+if __name__ == "__main__":
+    unittest.main()
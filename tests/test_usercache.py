@@ -0,0 +1,106 @@
+import os
+import time
+import unittest
+
+import tinydb
+from tinydb.storages import MemoryStorage
+from tinydb.table import Document
+
+from db import helpers, users
+from db.storage import BatchingMiddleware
+from db.usercache import UserCache
+
+
+def user(doc_id, name):
+    return Document({'username': name, 'friends': [], 'profile': {}}, doc_id)
+
+
+class TestUserCache(unittest.TestCase):
+
+    def setUp(self):
+        self.now = 0
+        self.cache = UserCache(ttl=10, max_users=2, clock=lambda: self.now)
+
+    def test_entries_expire(self):
+        self.cache.put(user(1, 'bobo'))
+        self.now = 9
+        self.assertEqual(self.cache.get('bobo')['username'], 'bobo')
+        self.now = 10
+        self.assertIsNone(self.cache.get('bobo'))
+        self.assertEqual(len(self.cache), 0)
+
+    def test_least_recently_used_goes_first(self):
+        self.cache.put(user(1, 'bobo'))
+        self.cache.put(user(2, 'krusty'))
+        self.cache.get('bobo')
+        self.cache.put(user(3, 'pennywise'))
+        self.assertIsNone(self.cache.get('krusty'))
+        self.assertIsNotNone(self.cache.get('bobo'))
+
+    def test_changes_drop_entries(self):
+        self.cache.put(user(1, 'bobo'))
+        self.cache.update(1, {'username': 'bozo'})
+        self.assertIsNone(self.cache.get('bobo'))
+
+    def test_entries_are_copies(self):
+        doc = user(1, 'bobo')
+        cached = self.cache.put(doc)
+        doc['friends'].append('krusty')
+        self.assertEqual(cached['friends'], [])
+        self.assertEqual(cached.doc_id, 1)
+
+
+class TestSessionUser(unittest.TestCase):
+
+    def make_db(self):
+        return helpers.SharedTinyDB(storage=BatchingMiddleware(MemoryStorage))
+
+    def setUp(self):
+        self.db = self.make_db()
+        for name in ('bobo', 'krusty'):
+            users.new_user(self.db, name, 'pw')
+
+    def tearDown(self):
+        self.db.close()
+
+    def test_cached_between_requests(self):
+        self.assertIs(users.get_session_user(self.db, 'bobo'),
+                      users.get_session_user(self.db, 'bobo'))
+
+    def test_session_user_follows_changes(self):
+        bobo = users.get_session_user(self.db, 'bobo')
+        self.assertEqual(bobo['username'], 'bobo')
+        self.assertIsNone(users.get_session_user(self.db, 'bozo'))
+
+        users.add_user_friend(self.db, bobo, 'krusty')
+        self.assertEqual(bobo['friends'], [])
+        self.assertEqual(users.get_session_user(self.db, 'bobo')['friends'], ['krusty'])
+
+        users.update_user_profile(self.db, 'bobo', bio='honk')
+        self.assertEqual(users.get_session_user(self.db, 'bobo')['profile']['bio'], 'honk')
+
+        users.remove_user_friend(self.db, users.get_session_user(self.db, 'bobo'), 'krusty')
+        self.assertEqual(users.get_session_user(self.db, 'bobo')['friends'], [])
+
+        users.delete_user(self.db, 'bobo', 'pw')
+        self.assertIsNone(users.get_session_user(self.db, 'bobo'))
+
+
+class TestSessionUserPlainTinyDB(TestSessionUser):
+
+    def make_db(self):
+        self.filename = '/tmp/youfacetestdb'+str(time.time())
+        return tinydb.TinyDB(self.filename)
+
+    def test_cached_between_requests(self):
+        # plain TinyDB can't tell the cache about changes, so nothing is cached
+        self.assertIsNot(users.get_session_user(self.db, 'bobo'),
+                         users.get_session_user(self.db, 'bobo'))
+
+    def tearDown(self):
+        super().tearDown()
+        os.remove(self.filename)
+
+
+if __name__ == "__main__":
+    unittest.main()
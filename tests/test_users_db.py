@@ -0,0 +1,198 @@
+import os
+import time
+import unittest
+
+import tinydb
+from tinydb.storages import MemoryStorage
+
+from db import helpers, users
+from db.storage import BatchingMiddleware
+
+
+class TestUsernameIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.db = helpers.SharedTinyDB(storage=BatchingMiddleware(MemoryStorage))
+        users.new_user(self.db, 'bobo', 'pw')
+        users.new_user(self.db, 'pennywise', 'pw')
+
+    def tearDown(self):
+        self.db.close()
+
+    def test_get_user_by_name(self):
+        self.assertEqual(users.get_user_by_name(self.db, 'bobo')['username'], 'bobo')
+        self.assertIsNone(users.get_user_by_name(self.db, 'krusty'))
+
+    def test_get_all_users(self):
+        self.assertEqual([user['username'] for user in users.get_all_users(self.db)],
+                         ['bobo', 'pennywise'])
+
+    def test_new_user_rejects_taken_name(self):
+        self.assertIsNone(users.new_user(self.db, 'bobo', 'other'))
+
+    def test_get_user_checks_password(self):
+        self.assertEqual(users.get_user(self.db, 'bobo', 'pw')['username'], 'bobo')
+        self.assertIsNone(users.get_user(self.db, 'bobo', 'wrong'))
+        self.assertIsNone(users.get_user(self.db, 'krusty', 'pw'))
+
+    def test_index_follows_updates_and_removes(self):
+        table = self.db.table('users')
+        bobo = users.get_user_by_name(self.db, 'bobo')
+        table.update({'username': 'bozo'}, doc_ids=[bobo.doc_id])
+        self.assertIsNone(users.get_user_by_name(self.db, 'bobo'))
+        self.assertEqual(users.get_user_by_name(self.db, 'bozo').doc_id, bobo.doc_id)
+
+        table.remove(doc_ids=[bobo.doc_id])
+        self.assertIsNone(users.get_user_by_name(self.db, 'bozo'))
+
+        table.truncate()
+        self.assertIsNone(users.get_user_by_name(self.db, 'pennywise'))
+
+    def test_get_users_by_names(self):
+        users.add_user_photo(self.db, 'pennywise', '/static/uploads/pennywise/balloon.png')
+        found = users.get_users_by_names(self.db, ['pennywise', 'krusty', 'bobo'])
+        self.assertEqual(found, [
+            {'username': 'pennywise', 'avatar': '/static/uploads/pennywise/balloon.png', 'bio': ''},
+            {'username': 'bobo', 'avatar': None, 'bio': ''},
+        ])
+
+    def test_get_user_friends(self):
+        bobo = users.get_user_by_name(self.db, 'bobo')
+        users.add_user_friend(self.db, bobo, 'pennywise')
+        friends = users.get_user_friends(self.db, users.get_user_by_name(self.db, 'bobo'))
+        self.assertEqual([f['username'] for f in friends], ['pennywise'])
+        self.assertNotIn('password', friends[0])
+
+    def test_update_user_profile(self):
+        self.assertTrue(users.update_user_profile(self.db, 'bobo', bio='honk'))
+        self.assertEqual(users.get_user_by_name(self.db, 'bobo')['profile']['bio'], 'honk')
+        self.assertFalse(users.update_user_profile(self.db, 'krusty', bio='honk'))
+
+
+class TestFindUsers(unittest.TestCase):
+
+    def setUp(self):
+        self.db = helpers.SharedTinyDB(storage=BatchingMiddleware(MemoryStorage))
+        users.new_user(self.db, 'bobo', 'pw', shoe_size=20, is_clown=True, has_clown_horns=True)
+        users.new_user(self.db, 'krusty', 'pw', shoe_size=14, is_clown=True)
+        users.new_user(self.db, 'pennywise', 'pw', shoe_size=16, has_clown_horns=True)
+        users.new_user(self.db, 'ronald', 'pw', shoe_size=0)
+
+    def tearDown(self):
+        self.db.close()
+
+    def names(self, **filters):
+        found, _ = users.find_users(self.db, **filters)
+        return [user['username'] for user in found]
+
+    def test_largest_shoes_first(self):
+        self.assertEqual(self.names(), ['bobo', 'pennywise', 'krusty', 'ronald'])
+
+    def test_filters_are_combined(self):
+        self.assertEqual(self.names(is_clown=True), ['bobo', 'krusty'])
+        self.assertEqual(self.names(has_clown_horns=True, min_shoe_size=17), ['bobo'])
+        self.assertEqual(self.names(is_clown=True, has_clown_horns=True), ['bobo'])
+        self.assertEqual(self.names(min_shoe_size=15), ['bobo', 'pennywise'])
+
+    def test_excludes_current_user(self):
+        self.assertEqual(self.names(exclude='bobo', is_clown=True), ['krusty'])
+
+    def test_pagination(self):
+        found, has_more = users.find_users(self.db, limit=3)
+        self.assertEqual(len(found), 3)
+        self.assertTrue(has_more)
+        found, has_more = users.find_users(self.db, offset=3, limit=3)
+        self.assertEqual([user['username'] for user in found], ['ronald'])
+        self.assertFalse(has_more)
+
+    def test_results_are_public_profile_cards(self):
+        found, _ = users.find_users(self.db, min_shoe_size=20)
+        self.assertEqual(found, [{'username': 'bobo', 'avatar': None, 'bio': '',
+                                  'is_clown': True, 'has_clown_horns': True,
+                                  'shoe_size': 20}])
+
+    def test_indexes_follow_profile_changes(self):
+        self.names(is_clown=True, min_shoe_size=1)
+        table = self.db.table('users')
+        krusty = users.get_user_by_name(self.db, 'krusty')
+        krusty['profile'].update(is_clown=False, shoe_size=30)
+        table.update(krusty, doc_ids=[krusty.doc_id])
+
+        self.assertEqual(self.names(is_clown=True), ['bobo'])
+        self.assertEqual(self.names(min_shoe_size=25), ['krusty'])
+
+
+class TestSearchUsers(unittest.TestCase):
+
+    def setUp(self):
+        self.db = helpers.SharedTinyDB(storage=BatchingMiddleware(MemoryStorage))
+        for name in ('Bobo', 'bobby', 'krusty', 'BoBo2', 'mr_bobo', 'pennywise'):
+            users.new_user(self.db, name, 'pw')
+
+    def tearDown(self):
+        self.db.close()
+
+    def names(self, query, limit=users.SEARCH_LIMIT):
+        return [user['username'] for user in users.search_users(self.db, query, limit)]
+
+    def test_ranks_exact_then_prefix_then_substring(self):
+        self.assertEqual(self.names('bobo'), ['Bobo', 'BoBo2', 'mr_bobo'])
+
+    def test_limit_keeps_best_matches(self):
+        self.assertEqual(self.names('bob', limit=2), ['bobby', 'Bobo'])
+        self.assertEqual(self.names('usty'), ['krusty'])
+
+    def test_short_queries_match_prefixes(self):
+        self.assertEqual(self.names('Bo'), ['bobby', 'Bobo', 'BoBo2'])
+        self.assertEqual(self.names('y'), [])
+        self.assertEqual(self.names('  '), [])
+
+    def test_results_leave_out_private_fields(self):
+        self.assertEqual(users.search_users(self.db, 'krusty'),
+                         [{'username': 'krusty', 'avatar': None, 'bio': ''}])
+
+    def test_index_follows_new_and_removed_users(self):
+        self.names('bobo')
+        users.new_user(self.db, 'bobolina', 'pw')
+        self.assertIn('bobolina', self.names('bobo'))
+
+        table = self.db.table('users')
+        table.remove(doc_ids=[users.get_user_by_name(self.db, 'mr_bobo').doc_id])
+        self.assertNotIn('mr_bobo', self.names('bobo'))
+
+
+class TestPlainTinyDB(unittest.TestCase):
+    """The db functions still work on an ordinary TinyDB, as the tests use."""
+
+    def setUp(self):
+        self.filename = '/tmp/youfacetestdb'+str(time.time())
+        self.db = tinydb.TinyDB(self.filename)
+        users.new_user(self.db, 'bobo', 'pw')
+
+    def tearDown(self):
+        self.db.close()
+        os.remove(self.filename)
+
+    def test_get_user_by_name(self):
+        self.assertEqual(users.get_user_by_name(self.db, 'bobo')['username'], 'bobo')
+        self.assertIsNone(users.new_user(self.db, 'bobo', 'pw'))
+
+    def test_get_users_by_names(self):
+        found = users.get_users_by_names(self.db, ['krusty', 'bobo'])
+        self.assertEqual([u['username'] for u in found], ['bobo'])
+
+    def test_find_users(self):
+        users.new_user(self.db, 'krusty', 'pw', shoe_size=14, is_clown=True)
+        found, has_more = users.find_users(self.db, exclude='bobo', is_clown=True)
+        self.assertEqual([u['username'] for u in found], ['krusty'])
+        self.assertFalse(has_more)
+
+    def test_search_users(self):
+        users.new_user(self.db, 'mr_bobo', 'pw')
+        found = users.search_users(self.db, 'BOBO')
+        self.assertEqual([u['username'] for u in found], ['bobo', 'mr_bobo'])
+        self.assertEqual(users.search_users(self.db, 'ob'), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
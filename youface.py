@@ -6,15 +6,18 @@ import flask
 import timeago
 import tinydb
 import os
-from db import users
+from db import blobs, passwords, users, helpers
+from db import comments as comment_db
+from db import likes as like_db
+from db import posts as post_db
 # handlers
-from handlers import friends, login, posts, profile, messages
+from handlers import assets, fragments, friends, login, posts, profile, messages, images, uploads
 from handlers.swipe import swipe_bp
 from werkzeug.utils import secure_filename
 from flask_wtf.csrf import CSRFProtect
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
-from flask import Flask, render_template, request, redirect, url_for, session
+from flask import Flask, render_template, request, redirect, url_for, session, g
 
 
 from flask_wtf.csrf import CSRFProtect
@@ -22,6 +25,8 @@ from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
 
 app = flask.Flask(__name__)
+# stream uploads to disk as they arrive, see handlers/uploads.py
+app.request_class = uploads.UploadRequest
 app.secret_key = "super-secret-key"
 
 # CSRF Protection
@@ -39,34 +44,59 @@ limiter = Limiter(
 def convert_time(ts):
     """A jinja template helper to convert timestamps to timeago."""
     return timeago.format(ts, time.time())
+
+# resized variants of uploaded images, see handlers/images.py
+app.jinja_env.filters['variant'] = images.variant_url
+app.jinja_env.filters['srcset'] = images.srcset
+
+# pagination cursors for load-more buttons, see db/posts.py
+app.jinja_env.filters['cursor'] = post_db.make_cursor
+
+app.register_error_handler(uploads.RejectedUpload, uploads.rejected)
+app.register_error_handler(uploads.UploadTooLarge, uploads.rejected)
+app.register_error_handler(passwords.PasswordPoolBusy, login.busy)
+
+# the logged-in user, looked up once per request into flask.g
+app.before_request(login.load_user)
+
+# content-hashed static URLs with long-lived caching, see handlers/assets.py
+assets.load_manifest(app.static_folder)
+app.url_defaults(assets.add_fingerprint)
+app.after_request(assets.cache_fingerprinted)
+
+# rendered post cards, see handlers/fragments.py
+app.jinja_env.globals['post_card'] = fragments.post_card
+
+
+@app.after_request
+def cache_blobs(response):
+    """Let browsers keep uploaded files forever; their URLs name their contents."""
+    if request.path.startswith(blobs.BLOB_URL) and response.status_code in (200, 304):
+        response.cache_control.no_cache = None
+        response.cache_control.public = True
+        response.cache_control.max_age = 365 * 24 * 60 * 60
+        response.cache_control.immutable = True
+    return response
 @app.route("/feed")
 def feed():
     username = session.get("username")
 
     if not username:
-        return redirect(url_for("login.login_page"))
+        return redirect(url_for("login.loginscreen"))
 
-    all_posts = posts.get_all_posts()  # You already have this in handlers/posts.py
+    db = helpers.load_db()
+    recent_posts = post_db.get_recent_posts(db)
+    post_ids = [post.doc_id for post in recent_posts]
 
     return render_template(
         "feed.html",
-        posts=all_posts,
-        user=users.get_user(username)  # From db/users.py
+        posts=recent_posts,
+        likes=like_db.like_states(db, post_ids, username),
+        comment_previews=comment_db.comment_previews(db, post_ids),
+        next_cursor=post_db.next_cursor(recent_posts),
+        more_url=url_for('posts.more_posts', scope='all'),
+        user=g.user
     )
-@app.route("/swipe")
-def swipe():
-    username = session.get("username")
-
-    if not username:
-        return redirect(url_for("login.login_page"))
-
-    all_users = users.get_all_users()
-
-    # Remove yourself from swipe options
-    all_users = [u for u in all_users if u["username"] != username]
-
-    return render_template("swipe.html", users=all_users)
-
 def timesince(dt):
     now = datetime.utcnow()
     diff = now - dt
@@ -86,20 +116,34 @@ def timesince(dt):
         return f"{int(days)} days"
 app.jinja_env.filters['timesince'] = timesince
 
-limiter = Limiter(
-    app=app,
-    key_func=get_remote_address,
-    default_limits=["200 per day", "50 per hour"]
-)
-
 app.register_blueprint(friends.blueprint)
 app.register_blueprint(login.blueprint)
 app.register_blueprint(posts.blueprint)
 app.register_blueprint(profile.blueprint)
 app.register_blueprint(messages.blueprint)
 app.register_blueprint(swipe_bp)
+
+
+def limit_endpoint(endpoint, *limits, **kwargs):
+    """Give a registered view its own rate limit.
+
+    Flask-Limiter only checks a limit set with ``limiter.limit`` when the
+    wrapper it returns is called, so the wrapper has to replace the view.
+    """
+    view = app.view_functions[endpoint]
+    app.view_functions[endpoint] = limiter.limit(*limits, **kwargs)(view)
+
+
 # Apply specific rate limit to the login endpoint
-limiter.limit("5 per minute", per_method=True, methods=["POST"])(login.login)
+limit_endpoint('login.login', "5 per minute", per_method=True, methods=["POST"])
+# Chat streams reconnect and poll on their own schedule
+limiter.exempt(messages.stream_messages)
+limiter.exempt(messages.new_messages)
+# The search box asks for suggestions as the user types
+limit_endpoint('friends.suggest_users', "120 per minute")
+# Liking is one request per click
+limit_endpoint('posts.like', "120 per minute")
+limit_endpoint('posts.unlike', "120 per minute")
 
 csrf = CSRFProtect(app)
 app.secret_key = 'mygroup'
@@ -107,6 +151,9 @@ app.config['SESSION_TYPE'] = 'filesystem'
 app.config['SEND_FILE_MAX_AGE_DEFAULT'] = 0
 app.config['UPLOAD_FOLDER'] = os.path.join('static', 'uploads')
 app.config['MAX_CONTENT_LENGTH'] = 5 * 1024 * 1024  # 5MB limit
+# YOUFACE_FRAGMENT_CACHE_BYTES=... in the environment sets FRAGMENT_CACHE_BYTES
+app.config.from_prefixed_env('YOUFACE')
+app.config.setdefault('FRAGMENT_CACHE_BYTES', fragments.MAX_BYTES)
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif'} 
 
 
@@ -114,4 +161,8 @@ def allowed_file(filename):
     return '.' in filename and filename.rsplit('.',1)[1].lower() in ALLOWED_EXTENSIONS
 
 if __name__ == "__main__":
-    app.run(host="0.0.0.0", port=5005, debug=False, use_reloader=False,threaded=True)
+    try:
+        app.run(host="0.0.0.0", port=5005, debug=False, use_reloader=False,threaded=True)
+    finally:
+        # make sure batched writes reach db.json before we exit
+        helpers.close_db()